@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the cold-start cost of importing money.Money in a fresh
+interpreter, and the cost of the first currency lookups afterwards.
+
+    $ python benchmarks/import_time.py [runs]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# The decimal module is imported up front because it is a large part of the
+# total import time and not something this package can change.
+SCRIPT = """
+import decimal, time
+start = time.time()
+from money.Money import CURRENCY
+imported = time.time()
+CURRENCY['USD'], CURRENCY['EUR']
+first = time.time()
+len(CURRENCY)
+everything = time.time()
+print imported - start, first - imported, everything - first
+"""
+
+
+def run(runs):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    samples = []
+    for i in range(runs):
+        output = subprocess.Popen([sys.executable, '-c', SCRIPT], env=env,
+                                  stdout=subprocess.PIPE).communicate()[0]
+        samples.append([float(value) * 1000 for value in output.split()])
+    return zip(*samples)
+
+
+def main(runs=20):
+    labels = ('import money.Money', 'first two lookups', 'load remaining table')
+    print '%-22s %10s %10s' % ('', 'min ms', 'median ms')
+    for label, timings in zip(labels, run(runs)):
+        timings = sorted(timings)
+        print '%-22s %10.2f %10.2f' % (label, timings[0], timings[len(timings) // 2])
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the per-instance memory footprint of the slotted Money and Currency
+classes with the old-style, __dict__ based versions they replaced.
+
+    $ python benchmarks/memory.py
+"""
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from money import Money, Currency
+
+
+class OldCurrency:
+    code = "XXX"
+    countries = []
+    exchange_rate = Decimal("1.0")
+    def __init__(self, code="", numeric="999", name="", symbol=u"", decimals=2, countries=[]):
+        self.code = code
+        self.numeric = numeric
+        self.name = name
+        self.symbol = symbol
+        self.decimals = decimals
+        self.countries = countries
+
+
+class OldMoney:
+    amount = Decimal("0.0")
+    currency = None
+    def __init__(self, amount=Decimal("0.0"), currency=None):
+        self.amount = amount
+        self.currency = currency
+
+
+def footprint(obj):
+    """
+    Size of the instance itself plus its attribute dict, if it has one.
+    The attribute values are shared and therefore not counted.
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main(count=1000000):
+    amount = Decimal("19.99")
+    old_currency = OldCurrency(code='USD', numeric='840', name='US Dollar', symbol=u"$")
+    new_currency = Currency(code='USD', numeric='840', name='US Dollar', symbol=u"$")
+    rows = (
+        ('Currency', footprint(old_currency), footprint(new_currency)),
+        ('Money', footprint(OldMoney(amount, old_currency)), footprint(Money(amount, new_currency))),
+    )
+    print '%-10s %10s %10s %8s' % ('class', 'old bytes', 'new bytes', 'saved')
+    for name, old, new in rows:
+        print '%-10s %10d %10d %7.0f%%' % (name, old, new, 100.0 * (old - new) / old)
+    old, new = rows[1][1], rows[1][2]
+    print
+    print '%d Money instances: %.1f MB -> %.1f MB (excluding the shared Decimal amounts)' % (
+        count, old * count / 1e6, new * count / 1e6)
+
+
+if __name__ == '__main__':
+    main()
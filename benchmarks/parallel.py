@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Compares money.parallel with the serial functions it stands in for, on a
+sequence of Money and on the same amounts as a buffer of money.wire records.
+
+    $ python benchmarks/parallel.py [count] [workers]
+
+The parallel functions only beat the serial ones with more than one CPU for
+a sequence of Money, since the per-amount work is the same and only split
+up. A wire buffer needs no Decimal arithmetic at all and is faster on any
+number of CPUs.
+"""
+import multiprocessing
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from money import Money, MoneyBag, RateTable, allocate_many, convert_many
+from money.parallel import parallel_sum, parallel_totals, parallel_convert, parallel_allocate
+from money.wire import pack_many
+
+
+def timed(function, *args, **kwargs):
+    start = time.time()
+    function(*args, **kwargs)
+    return time.time() - start
+
+
+def main(count=1000000, workers=None):
+    workers = workers or multiprocessing.cpu_count()
+    usd = [Money(Decimal(i % 100000) / 100, 'USD') for i in range(count)]
+    mixed = [Money(money.amount, 'EUR') if i % 3 == 0 else money for i, money in enumerate(usd)]
+    rates = RateTable([('EUR', 'USD', '1.1')])
+    usd_data = pack_many(usd)
+    mixed_data = pack_many(mixed)
+
+    rows = [
+        ('sum', lambda: Money.sum(usd),
+                lambda: parallel_sum(usd, workers=workers),
+                lambda: parallel_sum(usd_data, workers=workers)),
+        ('totals', lambda: MoneyBag(*mixed),
+                   lambda: parallel_totals(mixed, workers=workers),
+                   lambda: parallel_totals(mixed_data, workers=workers)),
+        ('convert', lambda: convert_many(mixed, 'USD', rates),
+                    lambda: parallel_convert(mixed, 'USD', rates, workers=workers),
+                    lambda: parallel_convert(mixed_data, 'USD', rates, workers=workers)),
+        ('allocate', lambda: allocate_many(mixed, (1, 2, 3)),
+                     lambda: parallel_allocate(mixed, (1, 2, 3), workers=workers),
+                     lambda: parallel_allocate(mixed_data, (1, 2, 3), workers=workers)),
+    ]
+    print '%d amounts, %d workers' % (count, workers)
+    print '%-10s %10s %14s %14s' % ('', 'serial s', 'parallel s', 'wire buffer s')
+    for label, serial, parallel, packed in rows:
+        print '%-10s %10.2f %14.2f %14.2f' % (label, timed(serial), timed(parallel), timed(packed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
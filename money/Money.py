@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
+import copy_reg
 import exceptions
+import numbers
+import os
+import re
+import threading
+from collections import MutableMapping
+from functools import wraps
 from decimal import Decimal
+from fractions import gcd
+
+class Currency(object):
+    __slots__ = ('code', 'numeric', 'name', 'symbol', 'decimals', 'countries', 'exchange_rate')
 
-class Currency:
-    code = "XXX"
-    country = ""
-    countries = []
-    name = ""
-    numeric = "999"
-    exchange_rate = Decimal("1.0")
     def __init__(self, code="", numeric="999", name="", symbol=u"", decimals=2, countries=[]):
         self.code = code
         self.numeric = numeric
@@ -16,82 +20,453 @@ class Currency:
         self.symbol = symbol
         self.decimals = decimals
         self.countries = countries
+        self.exchange_rate = Decimal("1.0")
 
     def __repr__(self):
         return self.code
     def set_exchange_rate(self, rate):
         if not isinstance(rate, Decimal):
-            rate = Decimal(str(rate))
+            rate = _to_decimal(rate)
         self.exchange_rate = rate
 
-CURRENCY = {}
-CURRENCY['XXX'] = Currency(code="XXX", numeric="999")
+    # Slotted classes have no __dict__ to pickle by default
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __reduce__(self):
+        # Registered currencies are pickled by code alone and unpickle as the
+        # registry's instance, so identity comparisons keep working.
+        if CURRENCY.get(self.code) is self:
+            return (_registered_currency, (self.code,))
+        return (copy_reg.__newobj__, (Currency,), self.__getstate__())
+
+class CurrencyRegistry(MutableMapping):
+    """
+    A mapping of currencies keyed by ISO 4217 alpha code.
+
+    Secondary indexes by numeric code, country and symbol are maintained as
+    currencies are added, so every lookup is a single dict access. Lookups
+    by code are case insensitive: the canonical upper case codes hit the dict
+    directly and any other spelling is resolved once in _missing() and then
+    remembered.
+
+    If a data file is given, it is only read on the first lookup that misses,
+    and each Currency is built the first time its code is requested. Anything
+    that needs the full table (iteration, len(), the secondary indexes, ...)
+    builds the remaining ones. It is not a dict subclass, so that copying it
+    with dict() or {}.update() can not skip the currencies not built yet.
+    """
+    def __init__(self, source=None):
+        self._currencies = {}
+        self._aliases = {}
+        self._numeric = {}
+        self._countries = {}
+        self._symbols = {}
+        self._source = source
+        self._pending = {}
+        self._order = []
+
+    def _read_source(self):
+        """
+        Reads the data file, keeping the raw line of every currency that has
+        not been registered explicitly.
+        """
+        source, self._source = self._source, None
+        f = open(source, 'rb')
+        try:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                code = line[:3]
+                if code not in self._currencies:
+                    self._pending[code] = line
+                    self._order.append(code)
+        finally:
+            f.close()
+
+    def _materialize(self, code):
+        code, numeric, decimals, symbol, name, countries = self._pending.pop(code).rstrip('\r\n').split('\t')
+        currency = Currency(code=code, numeric=numeric, name=name, symbol=symbol.decode('utf-8'),
+                            decimals=int(decimals), countries=countries and countries.split('|') or [])
+        self._currencies[code] = currency
+        self._index(code, currency)
+        return currency
+
+    def _materialize_all(self):
+        if self._source is not None:
+            self._read_source()
+        if self._pending:
+            for code in self._order:
+                if code in self._pending:
+                    self._materialize(code)
+        del self._order[:]
+
+    def _index(self, code, currency):
+        self._aliases[code.lower()] = currency
+        numeric = str(currency.numeric)
+        if numeric.isdigit():
+            self._numeric[currency.numeric] = currency
+            self._numeric[int(numeric)] = currency
+        for country in currency.countries:
+            self._countries[country] = self._countries.get(country, ()) + (currency,)
+        if currency.symbol:
+            self._symbols[currency.symbol] = self._symbols.get(currency.symbol, ()) + (currency,)
+
+    def _unindex(self, code, currency):
+        for aliases in (self._aliases, self._numeric):
+            for key, value in aliases.items():
+                if value is currency:
+                    del aliases[key]
+        for index in (self._countries, self._symbols):
+            for key, value in index.items():
+                if currency in value:
+                    value = tuple(c for c in value if c is not currency)
+                    if value:
+                        index[key] = value
+                    else:
+                        del index[key]
+
+    def _missing(self, code):
+        try:
+            return self._aliases[code]
+        except (KeyError, TypeError):
+            pass
+        if self._source is not None:
+            self._read_source()
+        normalized = str(code).upper()
+        currency = self._currencies.get(normalized)
+        if currency is None:
+            if normalized not in self._pending:
+                raise KeyError(code)
+            currency = self._materialize(normalized)
+        if code != normalized:
+            self._aliases[code] = currency
+        return currency
+
+    def __getitem__(self, code):
+        try:
+            return self._currencies[code]
+        except (KeyError, TypeError):
+            return self._missing(code)
+
+    def __setitem__(self, code, currency):
+        self._pending.pop(code, None)
+        if code in self._currencies:
+            self._unindex(code, self._currencies[code])
+        self._currencies[code] = currency
+        self._index(code, currency)
+
+    def __delitem__(self, code):
+        currency = self[code]
+        if code not in self._currencies:
+            code = str(code).upper()
+        self._unindex(code, currency)
+        del self._currencies[code]
+
+    def __contains__(self, code):
+        try:
+            self[code]
+        except KeyError:
+            return False
+        return True
+
+    has_key = __contains__
+
+    def __iter__(self):
+        self._materialize_all()
+        return iter(self._currencies)
+
+    def __len__(self):
+        self._materialize_all()
+        return len(self._currencies)
+
+    def __repr__(self):
+        self._materialize_all()
+        return repr(self._currencies)
+
+    def copy(self):
+        self._materialize_all()
+        return dict(self._currencies)
+
+    def clear(self):
+        self._currencies.clear()
+        self._source = None
+        del self._order[:]
+        for index in (self._pending, self._aliases, self._numeric, self._countries, self._symbols):
+            index.clear()
+
+    def register(self, currency):
+        self[currency.code] = currency
+        return currency
+
+    def by_numeric(self, numeric):
+        """
+        Returns the currency with the given ISO 4217 numeric code, which may
+        be given as an int or a string (e.g. 840, '840' or '008').
+        """
+        self._materialize_all()
+        try:
+            return self._numeric[numeric]
+        except KeyError:
+            pass
+        try:
+            return self._numeric[int(numeric)]
+        except (KeyError, ValueError, TypeError):
+            raise KeyError(numeric)
+
+    def by_country(self, country):
+        """
+        Returns a tuple of the currencies used in a country.
+        """
+        self._materialize_all()
+        try:
+            return self._countries[country]
+        except KeyError:
+            return self._countries.get(country.upper(), ())
+
+    def by_symbol(self, symbol):
+        """
+        Returns a tuple of the currencies that use a symbol, e.g. all of the
+        dollars for u"$".
+        """
+        self._materialize_all()
+        return self._symbols.get(symbol, ())
+
+#
+# ISO 4217 currencies are defined in data/iso4217.txt
+#
+def _registered_currency(code):
+    return CURRENCY[code]
+
+CURRENCY_DATA = os.path.join(os.path.dirname(__file__), 'data', 'iso4217.txt')
+CURRENCY = CurrencyRegistry(source=CURRENCY_DATA)
 DEFAULT_CURRENCY = CURRENCY['XXX']
 
 def set_default_currency(code="XXX"):
     global DEFAULT_CURRENCY
     DEFAULT_CURRENCY = CURRENCY[code]
 
-class IncorrectMoneyInputError(exceptions.Exception):
+def get_default_currency():
+    """
+    Returns the default currency of the current thread if one is set with
+    default_currency(), and the global one otherwise.
+    """
+    return _context.currency or DEFAULT_CURRENCY
+
+class _Context(threading.local):
     def __init__(self):
-        return
+        self.currency = None
+        self.saved = []
+
+_context = _Context()
+
+class _DefaultCurrency(object):
+    def __init__(self, currency):
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        self.currency = currency
+
+    def __enter__(self):
+        _context.saved.append(_context.currency)
+        _context.currency = self.currency
+        return self.currency
+
+    def __exit__(self, *exc_info):
+        _context.currency = _context.saved.pop()
+
+    def __call__(self, function):
+        @wraps(function)
+        def with_default_currency(*args, **kwargs):
+            with self:
+                return function(*args, **kwargs)
+        return with_default_currency
+
+def default_currency(currency):
+    """
+    Sets the default currency of the current thread only, for the duration
+    of a with block or of every call to a decorated function:
+
+        with default_currency('EUR'):
+            Money(10)           # EUR 10.00
+
+        @default_currency('GBP')
+        def handle(request):
+            ...
+
+    Scopes nest, and other threads keep seeing their own default, or the
+    global one set with set_default_currency(). Under gevent's monkey
+    patching every greenlet has its own default.
+    """
+    return _DefaultCurrency(currency)
+
+#
+# Exchange rates. By default cross rates are derived from the exchange_rate of
+# each Currency (its value in the default currency). A rate source, such as
+# money.exchange.RateTable, can be installed instead; it only needs a
+# rate(source_currency, target_currency) method returning a Decimal. Sources
+# that keep historical rates also accept an "at" argument.
+#
+_rate_source = None
+
+def set_rate_source(source=None):
+    global _rate_source
+    _rate_source = source
+
+def get_rate_source():
+    return _rate_source
+
+class _CurrencyRates(object):
+    """
+    The rate source that stands in when none is installed: rates are derived
+    from the exchange_rate of each Currency, and there are no historical
+    rates.
+    """
+    def rate(self, source, target, at=None):
+        if at is not None:
+            raise TypeError('no historical exchange rates available')
+        if source is target:
+            return Decimal(1)
+        return source.exchange_rate / target.exchange_rate
+
+_CURRENCY_RATES = _CurrencyRates()
+
+def _current_rates():
+    """
+    Returns the installed rate source, or the exchange_rate stand-in if there
+    is none. Batch conversions take it once and pass it on, so that they
+    keep converting with it even if a source is installed in the meantime.
+    """
+    if _rate_source is None:
+        return _CURRENCY_RATES
+    return _rate_source
+
+def get_exchange_rate(source, target, rates=None, at=None):
+    """
+    Returns the rate for converting from one Currency to another, using the
+    given rate source or else the installed one. If at is given, the rate
+    that applied at that time is returned.
+    """
+    if rates is None:
+        rates = _current_rates()
+    if at is not None:
+        return rates.rate(source, target, at)
+    return rates.rate(source, target)
+
+def to_minor_units(amount, decimals):
+    """
+    Converts a Decimal amount into an integer number of minor units (e.g.
+    cents) for a currency with the given number of decimal places. Raises
+    ValueError if the amount carries more precision than the currency has.
+    """
+    units = amount.scaleb(decimals)
+    integral = int(units)
+    if integral != units:
+        raise ValueError("%s has more than %d decimal places" % (amount, decimals))
+    return integral
+
+def from_minor_units(units, decimals):
+    """
+    The inverse of to_minor_units(). The result is exact.
+    """
+    return Decimal(units).scaleb(-decimals)
+
+class IncorrectMoneyInputError(exceptions.Exception):
+    def __init__(self, reason=None):
+        self.reason = reason
     def __unicode__(self):
-        return u"Incorrectly formatted monetary input"
+        return self.reason or u"Incorrectly formatted monetary input"
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+class Money(object):
+    """
+    An immutable amount of money in a given currency. Instances are hashable
+    so they can be used as dict keys and set members.
+    """
+    __slots__ = ('amount', 'currency')
 
-class Money:
-    amount = Decimal("0.0")
-    currency = DEFAULT_CURRENCY
     def __init__ (self, amount=Decimal("0.0"), currency=None):
         if not isinstance(amount, Decimal):
-            amount = Decimal(str(amount or 0))
-        self.amount = amount
+            amount = _to_decimal(amount or 0)
         if not currency:
-            self.currency = DEFAULT_CURRENCY
-        else:
-            if not isinstance(currency, Currency):
-                currency = CURRENCY[str(currency).upper()]
-            self.currency = currency
+            currency = _context.currency or DEFAULT_CURRENCY
+        elif not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        _set_amount(self, amount)
+        _set_currency(self, currency)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money is immutable")
+    def __delattr__(self, name):
+        raise AttributeError("Money is immutable")
+
+    def __hash__(self):
+        # Zero amounts compare equal to 0, so they have to hash like it too
+        if not self.amount:
+            return hash(0)
+        return hash((self.amount, self.currency))
+
+    def __reduce__(self):
+        # The amount as a string is exact and smaller than a pickled Decimal
+        currency = self.currency
+        if CURRENCY.get(currency.code) is currency:
+            currency = currency.code
+        return (Money, (str(self.amount), currency))
+    def __copy__(self):
+        return self
+    def __deepcopy__(self, memo):
+        return self
 
     def __unicode__(self):
         return unicode(self.amount)
 
     def __repr__(self):
-        return '%s %5.2f' % (self.currency, self.amount)
+        if not self.amount.is_finite():
+            return '%s %5s' % (self.currency, self.amount)
+        negative, whole, fraction = _fixed(self.amount, 2)
+        return '%s %5s' % (self.currency, '%s%d.%s' % ('-' if negative else '', whole, fraction))
     def __pos__(self):
-        return Money(amount=self.amount, currency=self.currency)
+        return _make(self.amount, self.currency)
     def __neg__(self):
-        return Money(amount=-self.amount, currency=self.currency)
+        return _make(-self.amount, self.currency)
     def __add__(self, other):
         if isinstance(other, Money):
-            if self.currency == other.currency:
-                return Money(amount = self.amount + other.amount, currency = self.currency)
+            if self.currency is other.currency:
+                return _make(self.amount + other.amount, self.currency)
             else:
                 s = self.convert_to_default()
                 other = other.convert_to_default()
-                return Money(amount = s.amount + other.amount, currency = DEFAULT_CURRENCY)
-        else:
-            return Money(amount = self.amount + Decimal(str(other)), currency = self.currency)
+                return _make(s.amount + other.amount, s.currency)
+        elif isinstance(other, _OPERANDS):
+            return _make(self.amount + _to_decimal(other), self.currency)
+        return NotImplemented
     def __sub__(self, other):
         if isinstance(other, Money):
-            if self.currency == other.currency:
-                return Money(amount = self.amount - other.amount, currency = self.currency)
+            if self.currency is other.currency:
+                return _make(self.amount - other.amount, self.currency)
             else:
                 s = self.convert_to_default()
                 other = other.convert_to_default()
-                return Money(amount = s.amount - other.amount, currency = DEFAULT_CURRENCY)
-        else:
-            return Money(amount = self.amount - Decimal(str(other)), currency = self.currency)
+                return _make(s.amount - other.amount, s.currency)
+        elif isinstance(other, _OPERANDS):
+            return _make(self.amount - _to_decimal(other), self.currency)
+        return NotImplemented
     def __mul__(self, other):
         if isinstance(other, Money):
             raise TypeError, 'can not multiply monetary quantities'
-        else:
-            return Money(amount = self.amount*Decimal(str(other)), currency = self.currency)
+        elif isinstance(other, _OPERANDS):
+            return _make(self.amount * _to_decimal(other), self.currency)
+        return NotImplemented
     def __div__(self, other):
         if isinstance(other, Money):
             assert self.currency == other.currency, 'currency mismatch'
             return self.amount / other.amount
-        else:
-            return self.amount / Decimal(str(other))
+        elif isinstance(other, _OPERANDS):
+            return self.amount / _to_decimal(other)
+        return NotImplemented
     def __rmod__(self, other):
         """
         Calculate percentage of an amount.  The left-hand side of the operator must be a numeric value.  E.g.:
@@ -101,15 +476,25 @@ class Money:
         """
         if isinstance(other, Money):
             raise TypeError, 'invalid monetary operation'
-        else:
-            return Money(amount = Decimal(str(other)) * self.amount / 100, currency = self.currency)
+        elif isinstance(other, _OPERANDS):
+            return _make(_to_decimal(other) * self.amount / 100, self.currency)
+        return NotImplemented
     def convert_to_default(self):
-        return Money(amount = self.amount * self.currency.exchange_rate, currency=DEFAULT_CURRENCY)
-    def convert_to(self, currency):
+        if _rate_source is not None:
+            return self.convert_to(_context.currency or DEFAULT_CURRENCY)
+        return _make(self.amount * self.currency.exchange_rate, _context.currency or DEFAULT_CURRENCY)
+    def convert_to(self, currency, rates=None, at=None):
         """
-        Convert from one currency to another.
+        Convert from one currency to another, using the given rate source or
+        the one installed with set_rate_source(). Without either, the rate is
+        derived from the exchange_rate of both currencies. Pass at to convert
+        at the rate that applied at that time (see money.HistoricalRates).
         """
-        return None # TODO  (How??)
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        if currency is self.currency:
+            return self
+        return _make(self.amount * get_exchange_rate(self.currency, currency, rates, at), currency)
 
     __radd__ = __add__
     __rsub__ = __sub__
@@ -122,6 +507,8 @@ class Money:
     def __eq__(self, other):
         if isinstance(other, Money):
             return (self.amount == other.amount) and (self.currency == other.currency)
+        if not isinstance(other, _OPERANDS):
+            return NotImplemented
         # Allow comparison to 0
         if (other == 0) and (self.amount == 0):
             return True
@@ -134,227 +521,379 @@ class Money:
         return not result
     def __lt__(self, other):
         if isinstance(other, Money):
-            if (self.currency == other.currency):
+            if (self.currency is other.currency):
                 return (self.amount < other.amount)
             else:
                 raise TypeError, 'can not compare different currencies'
-        else:
-            return (self.amount < Decimal(str(other)))
+        elif isinstance(other, _OPERANDS):
+            return (self.amount < _to_decimal(other))
+        return NotImplemented
     def __gt__(self, other):
         if isinstance(other, Money):
-            if (self.currency == other.currency):
+            if (self.currency is other.currency):
                 return (self.amount > other.amount)
             else:
                 raise TypeError, 'can not compare different currencies'
-        else:
-            return (self.amount > Decimal(str(other)))
+        elif isinstance(other, _OPERANDS):
+            return (self.amount > _to_decimal(other))
+        return NotImplemented
     def __le__(self, other):
+        if not isinstance(other, (Money,) + _OPERANDS):
+            return NotImplemented
         return self < other or self == other
     def __ge__(self, other):
+        if not isinstance(other, (Money,) + _OPERANDS):
+            return NotImplemented
         return self > other or self == other
 
     #
     # Miscellaneous helper methods
     #
 
+    @classmethod
+    def sum(cls, moneys, currency=None):
+        """
+        Adds up an iterable of Money in one currency. See msum().
+        """
+        return msum(moneys, currency)
+
     def allocate(self, ratios):
         """
-        Allocates a sum of money to several accounts.
+        Allocates a sum of money to several accounts, in proportion to ratios.
+
+        The amount is split in whole minor units of the currency (cents for
+        USD, yen for JPY, fils for KWD) using the largest remainder method:
+        every part is rounded down, and the units that are left over go to the
+        parts that lost the most in rounding. The parts always add up to the
+        original amount exactly. Amounts with more decimal places than the
+        currency are split in units of their own last decimal place.
         """
-        total = sum(ratios)
-        remainder = self.amount
-        results = []
-        for i in range(0, len(ratios)):
-            results.append(Money(amount = self.amount * ratios[i] / total, currency = self.currency))
-            remainder -= results[i].amount
-        i = 0
-        while i < remainder:
-            results[i].amount += Decimal("0.01")
-            i += 1
-        return results
+        weights, total = _allocation_weights(ratios)
+        units, exponent = _units(self.amount, self.currency.decimals)
+        return [_make(_from_units(share, exponent), self.currency)
+                for share in _split_units(units, weights, total)]
 
     def spell_out(self):
         """
-        Spells out a monetary amount.  E.g. "Two-hundred and twenty-six dollars and seventeen cents."
+        Spells out a monetary amount.  E.g. "Two hundred and twenty-six dollars and seventeen cents".
+        See money.spelling for the unit names of each currency.
+        """
+        from spelling import spell_out
+        return spell_out(self)
+
+    @classmethod
+    def parse(cls, s, currency=None, decimal_point='.', thousands=','):
+        """
+        Parses a monetary amount such as "USD 1,234.56", "-12.5 EUR",
+        u"\u00a3 10" or "$-3" and returns a new Money.
+
+        The currency can be given as a code or a symbol, before or after the
+        number. Input without one is in the given currency, or the default
+        currency. A symbol used by several currencies (like "$") only
+        resolves if one of them is the given or default currency. Raises
+        IncorrectMoneyInputError if the input can not be parsed.
         """
-        pass # TODO
+        money, error = _parse(s, currency, _money_pattern(decimal_point, thousands))
+        if error is not None:
+            raise IncorrectMoneyInputError(error)
+        return money
 
-    def from_string(self, s):
+    @classmethod
+    def from_string(cls, s):
         """
-        Parses a properly formatted string and extracts the monetary value and currency
+        Parses a properly formatted string and returns a new Money with the
+        monetary value and currency. See parse().
         """
+        return cls.parse(s)
+
+# Money is immutable, so its own code sets the slots through the descriptors
+_set_amount = Money.amount.__set__
+_set_currency = Money.currency.__set__
+_new = object.__new__
+
+def _make(amount, currency):
+    """
+    Internal constructor for trusted values. It skips all of the validation
+    and conversion in Money.__init__, so the amount must already be a Decimal
+    and the currency a Currency.
+    """
+    money = _new(Money)
+    _set_amount(money, amount)
+    _set_currency(money, currency)
+    return money
+
+# The operands other than Money that arithmetic and comparisons accept.
+# Anything else gets NotImplemented, so that e.g. Money + MoneyBag is left
+# to MoneyBag.__radd__().
+_OPERANDS = (numbers.Number, basestring)
+
+def _to_decimal(value):
+    """
+    Converts a numeric operand to Decimal.
+
+    Decimals are used as they are, and ints and longs are converted exactly.
+    Floats are converted from their shortest repr(), so 0.1 becomes
+    Decimal('0.1') rather than the binary value it actually holds
+    (0.1000000000000000055511151231257827...). Anything else is converted
+    from its string form.
+    """
+    kind = type(value)
+    if kind is Decimal:
+        return value
+    if kind is int or kind is long:
+        return Decimal(value)
+    if kind is float:
+        return Decimal(repr(value))
+    return Decimal(str(value))
+
+def msum(moneys, currency=None):
+    """
+    Adds up an iterable of Money and returns a single Money.
+
+    The amounts are accumulated as integers per decimal exponent (normally
+    there is just one: the currency's minor unit) and only the result is
+    turned back into a Decimal and wrapped in a Money. The total is exact,
+    no matter how large it gets, and any iterable, including a generator
+    over a large stream of records, is summed in constant memory.
+
+    All amounts must be in the same currency, otherwise TypeError is raised,
+    and ValueError is raised for an infinite or NaN amount. An empty iterable
+    gives zero in the given currency, or the default one.
+    """
+    if currency is not None and not isinstance(currency, Currency):
+        currency = CURRENCY[currency]
+    totals = {}
+    for money in moneys:
+        if money.currency is not currency:
+            if currency is not None:
+                raise TypeError('can not add different currencies')
+            currency = money.currency
+        sign, digits, exponent = money.amount.as_tuple()
+        if not isinstance(exponent, int):
+            raise ValueError("can not sum %s, it is not a finite amount" % money.amount)
+        units = int(''.join(map(str, digits)))
+        if sign:
+            units = -units
+        totals[exponent] = totals.get(exponent, 0) + units
+    currency = currency or _context.currency or DEFAULT_CURRENCY
+    if not totals:
+        return _make(Decimal(0), currency)
+    exponent = min(totals)
+    total = sum(units * 10 ** (e - exponent) for e, units in totals.items())
+    return _make(Decimal((int(total < 0), map(int, str(abs(total))), exponent)), currency)
+
+def allocate_many(moneys, ratios):
+    """
+    Allocates each of many amounts by the same ratios, see Money.allocate().
+    The ratios are only processed once. Returns a list with the list of
+    parts of every amount.
+    """
+    weights, total = _allocation_weights(ratios)
+    results = []
+    for money in moneys:
+        units, exponent = _units(money.amount, money.currency.decimals)
+        currency = money.currency
+        results.append([_make(_from_units(share, exponent), currency)
+                        for share in _split_units(units, weights, total)])
+    return results
+
+def _fraction(value):
+    """
+    Returns an exact (numerator, denominator) pair for a numeric value.
+    """
+    if isinstance(value, (int, long)):
+        return value, 1
+    if not isinstance(value, Decimal):
+        value = _to_decimal(value)
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError("can not use %s as a factor" % value)
+    numerator = 0
+    for digit in digits:
+        numerator = numerator * 10 + digit
+    if sign:
+        numerator = -numerator
+    if exponent >= 0:
+        return numerator * 10 ** exponent, 1
+    return numerator, 10 ** -exponent
+
+def _units(amount, decimals):
+    """
+    Returns an amount as an integer number of units of 10 ** exponent, where
+    exponent is the currency's minor unit or the amount's own last decimal
+    place, whichever is smaller.
+    """
+    sign, digits, exponent = amount.as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError("%s is not a finite amount" % amount)
+    units = int(''.join(map(str, digits)))
+    if sign:
+        units = -units
+    if exponent > -decimals:
+        units *= 10 ** (exponent + decimals)
+        exponent = -decimals
+    return units, exponent
+
+def _from_units(units, exponent):
+    return Decimal((int(units < 0), map(int, str(abs(units))), exponent))
+
+def _fixed(amount, places):
+    """
+    Rounds an amount half to even to a number of decimal places and returns
+    a (negative, whole, fraction) triple: whether it is below zero, the
+    integral part as an integer and the fractional digits as a string. Only
+    integers are used, so there is no loss of precision however large the
+    amount is.
+    """
+    units, exponent = _units(amount, places)
+    negative = units < 0
+    if negative:
+        units = -units
+    if exponent < -places:
+        divisor = 10 ** (-places - exponent)
+        units, remainder = divmod(units, divisor)
+        twice = 2 * remainder
+        if twice > divisor or (twice == divisor and units & 1):
+            units += 1
+    if not places:
+        return negative and units != 0, units, ''
+    whole, fraction = divmod(units, 10 ** places)
+    return negative and units != 0, whole, str(fraction).rjust(places, '0')
+
+def _allocation_weights(ratios):
+    """
+    Turns allocation ratios into integer weights and their total.
+    """
+    fractions = [_fraction(ratio) for ratio in ratios]
+    denominator = 1
+    for numerator, d in fractions:
+        denominator = denominator * d // gcd(denominator, d)
+    weights = [numerator * (denominator // d) for numerator, d in fractions]
+    total = sum(weights)
+    if not weights or total <= 0 or min(weights) < 0:
+        raise ValueError("allocation ratios must be non-negative and add up to more than zero")
+    return weights, total
+
+def _split_units(units, weights, total):
+    """
+    Splits an integer number of units by integer weights using the largest
+    remainder method. Ties go to the earlier weight.
+    """
+    negative = units < 0
+    if negative:
+        units = -units
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(units * weight, total)
+        shares.append(share)
+        remainders.append(remainder)
+    left = units - sum(shares)
+    if left:
+        order = sorted(range(len(weights)), key=remainders.__getitem__, reverse=True)
+        # sorted() with reverse=True keeps the original order of ties
+        for i in order[:left]:
+            shares[i] += 1
+    if negative:
+        shares = [-share for share in shares]
+    return shares
+
+_MONEY_PATTERNS = {}
+_strip_separators = re.compile(r'[^0-9]+').sub
+
+def _money_pattern(decimal_point, thousands):
+    """
+    Returns the match method of the compiled pattern for monetary input with
+    the given separators. The patterns are compiled once and include the
+    symbols of all of the currencies known at that time.
+    """
+    key = (decimal_point, thousands)
+    try:
+        return _MONEY_PATTERNS[key]
+    except KeyError:
+        pass
+    CURRENCY._materialize_all()
+    symbols = sorted(CURRENCY._symbols, key=len, reverse=True)
+    currency = r'(?:(%s)|([A-Za-z]{3}))' % u'|'.join(re.escape(symbol) for symbol in symbols)
+    if thousands:
+        integer = r'([0-9]{1,3}(?:%s[0-9]{3})+|[0-9]+)?' % re.escape(thousands)
+    else:
+        integer = r'([0-9]+)?'
+    pattern = (r'\s*([-+])?\s*' + currency + r'?\s*([-+])?\s*' + integer +
+               r'(?:%s([0-9]+))?\s*' % re.escape(decimal_point) + currency + r'?\s*$')
+    match = _MONEY_PATTERNS[key] = re.compile(pattern, re.UNICODE).match
+    return match
+
+def _resolve_symbol(symbol, currency):
+    candidates = CURRENCY.by_symbol(symbol)
+    if len(candidates) == 1:
+        return candidates[0]
+    if currency in candidates:
+        return currency
+    default = _context.currency or DEFAULT_CURRENCY
+    if default in candidates:
+        return default
+    return None
+
+def _parse(s, currency, match):
+    """
+    Parses one monetary amount and returns a (Money, None) pair, or (None,
+    reason) if it can not be parsed. Nothing is raised for bad input.
+    """
+    if isinstance(s, str):
         try:
-            self.amount = Decimal(str(s).strip())
-            self.currency = DEFAULT_CURRENCY
-        except:
-            try:
-                s = s.strip()
-                self.currency = CURRENCY[s[:3].upper()]
-                self.amount = Decimal(s[3:].strip())
-            except:
-                raise IncorrectMoneyInputError
+            s = s.decode('utf-8')
+        except UnicodeDecodeError:
+            return None, u"Input is not valid UTF-8: %r" % s
+    elif not isinstance(s, unicode):
+        return None, u"Expected a string, not %s" % type(s).__name__
+    found = match(s)
+    if found is None:
+        return None, u"Incorrectly formatted monetary input: %r" % s
+    sign, symbol, code, second_sign, integer, fraction, trailing_symbol, trailing_code = found.groups()
+    if integer is None and fraction is None:
+        return None, u"No amount in monetary input: %r" % s
+    if sign and second_sign:
+        return None, u"More than one sign in monetary input: %r" % s
+    if (symbol or code) and (trailing_symbol or trailing_code):
+        return None, u"More than one currency in monetary input: %r" % s
 
-#
-# Definitions of ISO 4217 Currencies
-# Source: http://www.iso.org/iso/support/faqs/faqs_widely_used_standards/widely_used_standards_other/currency_codes/currency_codes_list-1.htm
-# Symbols: http://www.xe.com/symbols.php
-#
+    if currency is not None and not isinstance(currency, Currency):
+        try:
+            currency = CURRENCY[currency]
+        except KeyError:
+            return None, u"Unknown currency code %r" % currency
+    code = code or trailing_code
+    symbol = symbol or trailing_symbol
+    if code:
+        currency = CURRENCY.get(code)
+        if currency is None:
+            return None, u"Unknown currency code %r" % code
+    elif symbol:
+        currency = _resolve_symbol(symbol, currency)
+        if currency is None:
+            return None, u"Ambiguous currency symbol %r" % symbol
+    elif currency is None:
+        currency = _context.currency or DEFAULT_CURRENCY
+
+    if integer is None:
+        integer = u'0'
+    elif not integer.isdigit():
+        integer = _strip_separators(u'', integer)
+    amount = (sign or second_sign or u'') + integer
+    if fraction:
+        amount += u'.' + fraction
+    return _make(Decimal(amount), currency), None
 
-CURRENCY['BZD'] = Currency(code='BZD', numeric='084', name='Belize Dollar', countries=['BELIZE'])
-CURRENCY['YER'] = Currency(code='YER', numeric='886', name='Yemeni Rial', countries=['YEMEN'])
-CURRENCY['XBA'] = Currency(code='XBA', numeric='955', name='Bond Markets Units European Composite Unit (EURCO)', countries=[])
-CURRENCY['SLL'] = Currency(code='SLL', numeric='694', name='Leone', countries=['SIERRA LEONE'])
-CURRENCY['ERN'] = Currency(code='ERN', numeric='232', name='Nakfa', countries=['ERITREA'])
-CURRENCY['NGN'] = Currency(code='NGN', numeric='566', name='Naira', countries=['NIGERIA'])
-CURRENCY['CRC'] = Currency(code='CRC', numeric='188', name='Costa Rican Colon', countries=['COSTA RICA'])
-CURRENCY['VEF'] = Currency(code='VEF', numeric='937', name='Bolivar Fuerte', countries=['VENEZUELA'])
-CURRENCY['LAK'] = Currency(code='LAK', numeric='418', name='Kip', countries=['LAO PEOPLES DEMOCRATIC REPUBLIC'])
-CURRENCY['DZD'] = Currency(code='DZD', numeric='012', name='Algerian Dinar', countries=['ALGERIA'])
-CURRENCY['SZL'] = Currency(code='SZL', numeric='748', name='Lilangeni', countries=['SWAZILAND'])
-CURRENCY['MOP'] = Currency(code='MOP', numeric='446', name='Pataca', countries=['MACAO'])
-CURRENCY['BYR'] = Currency(code='BYR', numeric='974', name='Belarussian Ruble', countries=['BELARUS'])
-CURRENCY['MUR'] = Currency(code='MUR', numeric='480', name='Mauritius Rupee', countries=['MAURITIUS'])
-CURRENCY['WST'] = Currency(code='WST', numeric='882', name='Tala', countries=['SAMOA'])
-CURRENCY['LRD'] = Currency(code='LRD', numeric='430', name='Liberian Dollar', countries=['LIBERIA'])
-CURRENCY['MMK'] = Currency(code='MMK', numeric='104', name='Kyat', countries=['MYANMAR'])
-CURRENCY['KGS'] = Currency(code='KGS', numeric='417', name='Som', countries=['KYRGYZSTAN'])
-CURRENCY['PYG'] = Currency(code='PYG', numeric='600', name='Guarani', countries=['PARAGUAY'])
-CURRENCY['IDR'] = Currency(code='IDR', numeric='360', name='Rupiah', countries=['INDONESIA'])
-CURRENCY['XBD'] = Currency(code='XBD', numeric='958', name='European Unit of Account 17(E.U.A.-17)', countries=[])
-CURRENCY['GTQ'] = Currency(code='GTQ', numeric='320', name='Quetzal', countries=['GUATEMALA'])
-CURRENCY['CAD'] = Currency(code='CAD', numeric='124', name='Canadian Dollar', symbol=u"$", decimals=2, countries=['CANADA'])
-CURRENCY['AWG'] = Currency(code='AWG', numeric='533', name='Aruban Guilder', countries=['ARUBA'])
-CURRENCY['TTD'] = Currency(code='TTD', numeric='780', name='Trinidad and Tobago Dollar', countries=['TRINIDAD AND TOBAGO'])
-CURRENCY['PKR'] = Currency(code='PKR', numeric='586', name='Pakistan Rupee', countries=['PAKISTAN'])
-CURRENCY['XBC'] = Currency(code='XBC', numeric='957', name='European Unit of Account 9(E.U.A.-9)', countries=[])
-CURRENCY['UZS'] = Currency(code='UZS', numeric='860', name='Uzbekistan Sum', countries=['UZBEKISTAN'])
-CURRENCY['XCD'] = Currency(code='XCD', numeric='951', name='East Caribbean Dollar', countries=['ANGUILLA', 'ANTIGUA AND BARBUDA', 'DOMINICA', 'GRENADA', 'MONTSERRAT', 'SAINT KITTS AND NEVIS', 'SAINT LUCIA', 'SAINT VINCENT AND THE GRENADINES'])
-CURRENCY['VUV'] = Currency(code='VUV', numeric='548', name='Vatu', countries=['VANUATU'])
-CURRENCY['KMF'] = Currency(code='KMF', numeric='174', name='Comoro Franc', countries=['COMOROS'])
-CURRENCY['AZN'] = Currency(code='AZN', numeric='944', name='Azerbaijanian Manat', countries=['AZERBAIJAN'])
-CURRENCY['XPD'] = Currency(code='XPD', numeric='964', name='Palladium', countries=[])
-CURRENCY['MNT'] = Currency(code='MNT', numeric='496', name='Tugrik', countries=['MONGOLIA'])
-CURRENCY['ANG'] = Currency(code='ANG', numeric='532', name='Netherlands Antillian Guilder', countries=['NETHERLANDS ANTILLES'])
-CURRENCY['LBP'] = Currency(code='LBP', numeric='422', name='Lebanese Pound', countries=['LEBANON'])
-CURRENCY['KES'] = Currency(code='KES', numeric='404', name='Kenyan Shilling', countries=['KENYA'])
-CURRENCY['GBP'] = Currency(code='GBP', numeric='826', name='Pound Sterling', symbol=u"£", decimals=2, countries=['UNITED KINGDOM'])
-CURRENCY['SEK'] = Currency(code='SEK', numeric='752', name='Swedish Krona', countries=['SWEDEN'])
-CURRENCY['AFN'] = Currency(code='AFN', numeric='971', name='Afghani', countries=['AFGHANISTAN'])
-CURRENCY['KZT'] = Currency(code='KZT', numeric='398', name='Tenge', countries=['KAZAKHSTAN'])
-CURRENCY['ZMK'] = Currency(code='ZMK', numeric='894', name='Kwacha', countries=['ZAMBIA'])
-CURRENCY['SKK'] = Currency(code='SKK', numeric='703', name='Slovak Koruna', countries=['SLOVAKIA'])
-CURRENCY['DKK'] = Currency(code='DKK', numeric='208', name='Danish Krone', countries=['DENMARK', 'FAROE ISLANDS', 'GREENLAND'])
-CURRENCY['TMM'] = Currency(code='TMM', numeric='795', name='Manat', countries=['TURKMENISTAN'])
-CURRENCY['AMD'] = Currency(code='AMD', numeric='051', name='Armenian Dram', countries=['ARMENIA'])
-CURRENCY['SCR'] = Currency(code='SCR', numeric='690', name='Seychelles Rupee', countries=['SEYCHELLES'])
-CURRENCY['FJD'] = Currency(code='FJD', numeric='242', name='Fiji Dollar', countries=['FIJI'])
-CURRENCY['SHP'] = Currency(code='SHP', numeric='654', name='Saint Helena Pound', countries=['SAINT HELENA'])
-CURRENCY['ALL'] = Currency(code='ALL', numeric='008', name='Lek', countries=['ALBANIA'])
-CURRENCY['TOP'] = Currency(code='TOP', numeric='776', name='Paanga', countries=['TONGA'])
-CURRENCY['UGX'] = Currency(code='UGX', numeric='800', name='Uganda Shilling', countries=['UGANDA'])
-CURRENCY['OMR'] = Currency(code='OMR', numeric='512', name='Rial Omani', countries=['OMAN'])
-CURRENCY['DJF'] = Currency(code='DJF', numeric='262', name='Djibouti Franc', countries=['DJIBOUTI'])
-CURRENCY['BND'] = Currency(code='BND', numeric='096', name='Brunei Dollar', countries=['BRUNEI DARUSSALAM'])
-CURRENCY['TND'] = Currency(code='TND', numeric='788', name='Tunisian Dinar', countries=['TUNISIA'])
-CURRENCY['SBD'] = Currency(code='SBD', numeric='090', name='Solomon Islands Dollar', countries=['SOLOMON ISLANDS'])
-CURRENCY['GHS'] = Currency(code='GHS', numeric='936', name='Ghana Cedi', countries=['GHANA'])
-CURRENCY['GNF'] = Currency(code='GNF', numeric='324', name='Guinea Franc', countries=['GUINEA'])
-CURRENCY['CVE'] = Currency(code='CVE', numeric='132', name='Cape Verde Escudo', countries=['CAPE VERDE'])
-CURRENCY['ARS'] = Currency(code='ARS', numeric='032', name='Argentine Peso', countries=['ARGENTINA'])
-CURRENCY['GMD'] = Currency(code='GMD', numeric='270', name='Dalasi', countries=['GAMBIA'])
-CURRENCY['ZWD'] = Currency(code='ZWD', numeric='716', name='Zimbabwe Dollar', countries=['ZIMBABWE'])
-CURRENCY['MWK'] = Currency(code='MWK', numeric='454', name='Kwacha', countries=['MALAWI'])
-CURRENCY['BDT'] = Currency(code='BDT', numeric='050', name='Taka', countries=['BANGLADESH'])
-CURRENCY['KWD'] = Currency(code='KWD', numeric='414', name='Kuwaiti Dinar', countries=['KUWAIT'])
-CURRENCY['EUR'] = Currency(code='EUR', numeric='978', name='Euro', symbol=u"€", decimals=2, countries=['ANDORRA', 'AUSTRIA', 'BELGIUM', 'FINLAND', 'FRANCE', 'FRENCH GUIANA', 'FRENCH SOUTHERN TERRITORIES', 'GERMANY', 'GREECE', 'GUADELOUPE', 'IRELAND', 'ITALY', 'LUXEMBOURG', 'MARTINIQUE', 'MAYOTTE', 'MONACO', 'MONTENEGRO', 'NETHERLANDS', 'PORTUGAL', 'R.UNION', 'SAINT PIERRE AND MIQUELON', 'SAN MARINO', 'SLOVENIA', 'SPAIN'])
-CURRENCY['CHF'] = Currency(code='CHF', numeric='756', name='Swiss Franc', symbol=u"Fr.", decimals=2, countries=['LIECHTENSTEIN'])
-CURRENCY['XAG'] = Currency(code='XAG', numeric='961', name='Silver', countries=[])
-CURRENCY['SRD'] = Currency(code='SRD', numeric='968', name='Surinam Dollar', countries=['SURINAME'])
-CURRENCY['DOP'] = Currency(code='DOP', numeric='214', name='Dominican Peso', countries=['DOMINICAN REPUBLIC'])
-CURRENCY['PEN'] = Currency(code='PEN', numeric='604', name='Nuevo Sol', countries=['PERU'])
-CURRENCY['KPW'] = Currency(code='KPW', numeric='408', name='North Korean Won', countries=['KOREA'])
-CURRENCY['SGD'] = Currency(code='SGD', numeric='702', name='Singapore Dollar', countries=['SINGAPORE'])
-CURRENCY['TWD'] = Currency(code='TWD', numeric='901', name='New Taiwan Dollar', countries=['TAIWAN'])
-CURRENCY['USD'] = Currency(code='USD', numeric='840', name='US Dollar', symbol=u"$", decimals=2, countries=['AMERICAN SAMOA', 'BRITISH INDIAN OCEAN TERRITORY', 'ECUADOR', 'GUAM', 'MARSHALL ISLANDS', 'MICRONESIA', 'NORTHERN MARIANA ISLANDS', 'PALAU', 'PUERTO RICO', 'TIMOR-LESTE', 'TURKS AND CAICOS ISLANDS', 'UNITED STATES MINOR OUTLYING ISLANDS', 'VIRGIN ISLANDS (BRITISH)', 'VIRGIN ISLANDS (U.S.)'])
-CURRENCY['BGN'] = Currency(code='BGN', numeric='975', name='Bulgarian Lev', countries=['BULGARIA'])
-CURRENCY['MAD'] = Currency(code='MAD', numeric='504', name='Moroccan Dirham', countries=['MOROCCO', 'WESTERN SAHARA'])
-CURRENCY['XXX'] = Currency(code='XXX', numeric='999', name='XXX', countries=[])
-CURRENCY['SAR'] = Currency(code='SAR', numeric='682', name='Saudi Riyal', countries=['SAUDI ARABIA'])
-CURRENCY['AUD'] = Currency(code='AUD', numeric='036', name='Australian Dollar', symbol=u"$", countries=['AUSTRALIA', 'CHRISTMAS ISLAND', 'COCOS (KEELING) ISLANDS', 'HEARD ISLAND AND MCDONALD ISLANDS', 'KIRIBATI', 'NAURU', 'NORFOLK ISLAND', 'TUVALU'])
-CURRENCY['KYD'] = Currency(code='KYD', numeric='136', name='Cayman Islands Dollar', countries=['CAYMAN ISLANDS'])
-CURRENCY['KRW'] = Currency(code='KRW', numeric='410', name='Won', countries=['KOREA'])
-CURRENCY['GIP'] = Currency(code='GIP', numeric='292', name='Gibraltar Pound', countries=['GIBRALTAR'])
-CURRENCY['TRY'] = Currency(code='TRY', numeric='949', name='New Turkish Lira', countries=['TURKEY'])
-CURRENCY['XAU'] = Currency(code='XAU', numeric='959', name='Gold', countries=[])
-CURRENCY['CZK'] = Currency(code='CZK', numeric='203', name='Czech Koruna', countries=['CZECH REPUBLIC'])
-CURRENCY['JMD'] = Currency(code='JMD', numeric='388', name='Jamaican Dollar', countries=['JAMAICA'])
-CURRENCY['BSD'] = Currency(code='BSD', numeric='044', name='Bahamian Dollar', countries=['BAHAMAS'])
-CURRENCY['BWP'] = Currency(code='BWP', numeric='072', name='Pula', countries=['BOTSWANA'])
-CURRENCY['GYD'] = Currency(code='GYD', numeric='328', name='Guyana Dollar', countries=['GUYANA'])
-CURRENCY['XTS'] = Currency(code='XTS', numeric='963', name='Codes specifically reserved for testing purposes', countries=[])
-CURRENCY['LYD'] = Currency(code='LYD', numeric='434', name='Libyan Dinar', countries=['LIBYAN ARAB JAMAHIRIYA'])
-CURRENCY['EGP'] = Currency(code='EGP', numeric='818', name='Egyptian Pound', countries=['EGYPT'])
-CURRENCY['THB'] = Currency(code='THB', numeric='764', name='Baht', countries=['THAILAND'])
-CURRENCY['MKD'] = Currency(code='MKD', numeric='807', name='Denar', countries=['MACEDONIA'])
-CURRENCY['SDG'] = Currency(code='SDG', numeric='938', name='Sudanese Pound', countries=['SUDAN'])
-CURRENCY['AED'] = Currency(code='AED', numeric='784', name='UAE Dirham', countries=['UNITED ARAB EMIRATES'])
-CURRENCY['JOD'] = Currency(code='JOD', numeric='400', name='Jordanian Dinar', countries=['JORDAN'])
-CURRENCY['JPY'] = Currency(code='JPY', numeric='392', name='Yen', symbol=u"¥", decimals=0, countries=['JAPAN'])
-CURRENCY['ZAR'] = Currency(code='ZAR', numeric='710', name='Rand', countries=['SOUTH AFRICA'])
-CURRENCY['HRK'] = Currency(code='HRK', numeric='191', name='Croatian Kuna', countries=['CROATIA'])
-CURRENCY['AOA'] = Currency(code='AOA', numeric='973', name='Kwanza', countries=['ANGOLA'])
-CURRENCY['RWF'] = Currency(code='RWF', numeric='646', name='Rwanda Franc', countries=['RWANDA'])
-CURRENCY['CUP'] = Currency(code='CUP', numeric='192', name='Cuban Peso', countries=['CUBA'])
-CURRENCY['XFO'] = Currency(code='XFO', numeric='Nil', name='Gold-Franc', countries=[])
-CURRENCY['BBD'] = Currency(code='BBD', numeric='052', name='Barbados Dollar', countries=['BARBADOS'])
-CURRENCY['PGK'] = Currency(code='PGK', numeric='598', name='Kina', countries=['PAPUA NEW GUINEA'])
-CURRENCY['LKR'] = Currency(code='LKR', numeric='144', name='Sri Lanka Rupee', countries=['SRI LANKA'])
-CURRENCY['RON'] = Currency(code='RON', numeric='946', name='New Leu', countries=['ROMANIA'])
-CURRENCY['PLN'] = Currency(code='PLN', numeric='985', name='Zloty', countries=['POLAND'])
-CURRENCY['IQD'] = Currency(code='IQD', numeric='368', name='Iraqi Dinar', countries=['IRAQ'])
-CURRENCY['TJS'] = Currency(code='TJS', numeric='972', name='Somoni', countries=['TAJIKISTAN'])
-CURRENCY['MDL'] = Currency(code='MDL', numeric='498', name='Moldovan Leu', countries=['MOLDOVA'])
-CURRENCY['MYR'] = Currency(code='MYR', numeric='458', name='Malaysian Ringgit', countries=['MALAYSIA'])
-CURRENCY['CNY'] = Currency(code='CNY', numeric='156', name='Yuan Renminbi', countries=['CHINA'])
-CURRENCY['LVL'] = Currency(code='LVL', numeric='428', name='Latvian Lats', countries=['LATVIA'])
-CURRENCY['INR'] = Currency(code='INR', numeric='356', name='Indian Rupee', countries=['INDIA'])
-CURRENCY['FKP'] = Currency(code='FKP', numeric='238', name='Falkland Islands Pound', countries=['FALKLAND ISLANDS (MALVINAS)'])
-CURRENCY['NIO'] = Currency(code='NIO', numeric='558', name='Cordoba Oro', countries=['NICARAGUA'])
-CURRENCY['PHP'] = Currency(code='PHP', numeric='608', name='Philippine Peso', countries=['PHILIPPINES'])
-CURRENCY['HNL'] = Currency(code='HNL', numeric='340', name='Lempira', countries=['HONDURAS'])
-CURRENCY['HKD'] = Currency(code='HKD', numeric='344', name='Hong Kong Dollar', countries=['HONG KONG'])
-CURRENCY['NZD'] = Currency(code='NZD', numeric='554', name='New Zealand Dollar', countries=['COOK ISLANDS', 'NEW ZEALAND', 'NIUE', 'PITCAIRN', 'TOKELAU'])
-CURRENCY['BRL'] = Currency(code='BRL', numeric='986', name='Brazilian Real', countries=['BRAZIL'])
-CURRENCY['RSD'] = Currency(code='RSD', numeric='941', name='Serbian Dinar', countries=['SERBIA'])
-CURRENCY['XBB'] = Currency(code='XBB', numeric='956', name='European Monetary Unit (E.M.U.-6)', countries=[])
-CURRENCY['EEK'] = Currency(code='EEK', numeric='233', name='Kroon', countries=['ESTONIA'])
-CURRENCY['SOS'] = Currency(code='SOS', numeric='706', name='Somali Shilling', countries=['SOMALIA'])
-CURRENCY['MZN'] = Currency(code='MZN', numeric='943', name='Metical', countries=['MOZAMBIQUE'])
-CURRENCY['XFU'] = Currency(code='XFU', numeric='Nil', name='UIC-Franc', countries=[])
-CURRENCY['NOK'] = Currency(code='NOK', numeric='578', name='Norwegian Krone', countries=['BOUVET ISLAND', 'NORWAY', 'SVALBARD AND JAN MAYEN'])
-CURRENCY['ISK'] = Currency(code='ISK', numeric='352', name='Iceland Krona', countries=['ICELAND'])
-CURRENCY['GEL'] = Currency(code='GEL', numeric='981', name='Lari', countries=['GEORGIA'])
-CURRENCY['ILS'] = Currency(code='ILS', numeric='376', name='New Israeli Sheqel', countries=['ISRAEL'])
-CURRENCY['HUF'] = Currency(code='HUF', numeric='348', name='Forint', countries=['HUNGARY'])
-CURRENCY['UAH'] = Currency(code='UAH', numeric='980', name='Hryvnia', countries=['UKRAINE'])
-CURRENCY['RUB'] = Currency(code='RUB', numeric='643', name='Russian Ruble', symbol=u"руб", countries=['RUSSIAN FEDERATION'])
-CURRENCY['IRR'] = Currency(code='IRR', numeric='364', name='Iranian Rial', countries=['IRAN'])
-CURRENCY['BMD'] = Currency(code='BMD', numeric='060', name='Bermudian Dollar', countries=['BERMUDA'])
-CURRENCY['MGA'] = Currency(code='MGA', numeric='969', name='Malagasy Ariary', countries=['MADAGASCAR'])
-CURRENCY['MVR'] = Currency(code='MVR', numeric='462', name='Rufiyaa', countries=['MALDIVES'])
-CURRENCY['QAR'] = Currency(code='QAR', numeric='634', name='Qatari Rial', countries=['QATAR'])
-CURRENCY['VND'] = Currency(code='VND', numeric='704', name='Dong', countries=['VIET NAM'])
-CURRENCY['MRO'] = Currency(code='MRO', numeric='478', name='Ouguiya', countries=['MAURITANIA'])
-CURRENCY['NPR'] = Currency(code='NPR', numeric='524', name='Nepalese Rupee', countries=['NEPAL'])
-CURRENCY['TZS'] = Currency(code='TZS', numeric='834', name='Tanzanian Shilling', countries=['TANZANIA'])
-CURRENCY['BIF'] = Currency(code='BIF', numeric='108', name='Burundi Franc', countries=['BURUNDI'])
-CURRENCY['XPT'] = Currency(code='XPT', numeric='962', name='Platinum', countries=[])
-CURRENCY['KHR'] = Currency(code='KHR', numeric='116', name='Riel', countries=['CAMBODIA'])
-CURRENCY['SYP'] = Currency(code='SYP', numeric='760', name='Syrian Pound', countries=['SYRIAN ARAB REPUBLIC'])
-CURRENCY['BHD'] = Currency(code='BHD', numeric='048', name='Bahraini Dinar', countries=['BAHRAIN'])
-CURRENCY['XDR'] = Currency(code='XDR', numeric='960', name='SDR', countries=['INTERNATIONAL MONETARY FUND (I.M.F)'])
-CURRENCY['STD'] = Currency(code='STD', numeric='678', name='Dobra', countries=['SAO TOME AND PRINCIPE'])
-CURRENCY['BAM'] = Currency(code='BAM', numeric='977', name='Convertible Marks', countries=['BOSNIA AND HERZEGOVINA'])
-CURRENCY['LTL'] = Currency(code='LTL', numeric='440', name='Lithuanian Litas', countries=['LITHUANIA'])
-CURRENCY['ETB'] = Currency(code='ETB', numeric='230', name='Ethiopian Birr', countries=['ETHIOPIA'])
-CURRENCY['XPF'] = Currency(code='XPF', numeric='953', name='CFP Franc', countries=['FRENCH POLYNESIA', 'NEW CALEDONIA', 'WALLIS AND FUTUNA'])
+def parse_many(lines, currency=None, decimal_point='.', thousands=','):
+    """
+    Parses an iterable of monetary amounts, like the lines of a file or a
+    column of a CSV file, and yields a (Money, None) pair for every one that
+    parses and a (None, reason) pair for every one that does not. The input
+    is read lazily and malformed values cost no exceptions, so large feeds
+    can be streamed through and the errors collected by row. See
+    Money.parse() for the accepted formats.
+    """
+    match = _money_pattern(decimal_point, thousands)
+    for line in lines:
+        yield _parse(line, currency, match)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+import operator
+from array import array
+from decimal import Decimal
+from Money import Money, Currency, CURRENCY, get_default_currency, to_minor_units, from_minor_units
+from Money import get_exchange_rate, get_rate_source
+from Money import _allocation_weights, _fraction, _split_units, _to_decimal
+
+__all__ = ('MoneyArray',)
+
+# Use a 64 bit signed integer for the minor units. Python 2 has no 'q'
+# typecode, but 'l' is 64 bits wide on LP64 platforms.
+try:
+    TYPECODE = 'q'
+    array(TYPECODE)
+except ValueError:
+    TYPECODE = 'l'
+
+
+def _currency(currency):
+    if not currency:
+        return get_default_currency()
+    if not isinstance(currency, Currency):
+        currency = CURRENCY[currency]
+    return currency
+
+def _round_div(numerator, denominator):
+    """
+    Integer division rounded half to even. The denominator must be positive.
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+
+class MoneyArray(object):
+    """
+    A column of amounts in a single currency, stored as a contiguous array
+    of integer minor units using Currency.decimals as the scale. Arithmetic
+    works on the integers directly so no Money or Decimal objects are built
+    per element. Operations that can produce fractions of a minor unit
+    (multiplication, percentages, conversion) round half to even.
+    """
+    def __init__(self, units=(), currency=None):
+        self.currency = _currency(currency)
+        self.units = array(TYPECODE, units)
+
+    @classmethod
+    def _wrap(cls, units, currency):
+        result = cls.__new__(cls)
+        result.currency = currency
+        result.units = units
+        return result
+
+    @classmethod
+    def from_money(cls, moneys, currency=None):
+        """
+        Builds an array from an iterable of Money. All of them must be in the
+        same currency. Raises ValueError if an amount has more decimal places
+        than the currency allows.
+        """
+        currency = currency and _currency(currency)
+        units = array(TYPECODE)
+        append = units.append
+        decimals = currency and currency.decimals
+        for money in moneys:
+            if currency is None:
+                currency = money.currency
+                decimals = currency.decimals
+            elif money.currency != currency:
+                raise TypeError('currency mismatch')
+            append(to_minor_units(money.amount, decimals))
+        return cls._wrap(units, currency or get_default_currency())
+
+    @classmethod
+    def from_amounts(cls, amounts, currency=None):
+        """
+        Builds an array from an iterable of numeric amounts.
+        """
+        currency = _currency(currency)
+        decimals = currency.decimals
+        units = array(TYPECODE)
+        append = units.append
+        for amount in amounts:
+            append(to_minor_units(_to_decimal(amount), decimals))
+        return cls._wrap(units, currency)
+
+    def to_money(self):
+        return list(self)
+
+    def amounts(self):
+        decimals = self.currency.decimals
+        return [from_minor_units(unit, decimals) for unit in self.units]
+
+    def __repr__(self):
+        return 'MoneyArray(%s, [%s])' % (self.currency, ', '.join(map(str, self.amounts())))
+
+    def __len__(self):
+        return len(self.units)
+
+    def __iter__(self):
+        currency = self.currency
+        decimals = currency.decimals
+        for unit in self.units:
+            yield Money(from_minor_units(unit, decimals), currency)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._wrap(self.units[index], self.currency)
+        return Money(from_minor_units(self.units[index], self.currency.decimals), self.currency)
+
+    #
+    # Arithmetic
+    #
+
+    def _scalar_units(self, other):
+        if isinstance(other, Money):
+            other = other.amount
+        return to_minor_units(_to_decimal(other), self.currency.decimals)
+
+    def _binary(self, other, op):
+        if isinstance(other, MoneyArray):
+            if len(other.units) != len(self.units):
+                raise ValueError('arrays have different lengths')
+            if self.currency == other.currency:
+                return self._wrap(array(TYPECODE, map(op, self.units, other.units)), self.currency)
+            s = self.convert_to_default()
+            other = other.convert_to_default()
+            return s._binary(other, op)
+        if isinstance(other, Money) and self.currency != other.currency:
+            s = self.convert_to_default()
+            return s._binary(other.convert_to_default(), op)
+        scalar = self._scalar_units(other)
+        return self._wrap(array(TYPECODE, [op(unit, scalar) for unit in self.units]), self.currency)
+
+    def __add__(self, other):
+        return self._binary(other, operator.add)
+
+    def __sub__(self, other):
+        return self._binary(other, operator.sub)
+
+    def __rsub__(self, other):
+        return (-self)._binary(other, operator.add)
+
+    def __neg__(self):
+        return self._wrap(array(TYPECODE, [-unit for unit in self.units]), self.currency)
+
+    def __pos__(self):
+        return self._wrap(array(TYPECODE, self.units), self.currency)
+
+    def _scale(self, numerator, denominator):
+        if denominator == 1:
+            units = [unit * numerator for unit in self.units]
+        else:
+            units = [_round_div(unit * numerator, denominator) for unit in self.units]
+        return self._wrap(array(TYPECODE, units), self.currency)
+
+    def __mul__(self, other):
+        if isinstance(other, (Money, MoneyArray)):
+            raise TypeError('can not multiply monetary quantities')
+        return self._scale(*_fraction(other))
+
+    def __rmod__(self, other):
+        """
+        Calculate percentage of every amount, rounded to the minor unit.
+        """
+        if isinstance(other, (Money, MoneyArray)):
+            raise TypeError('invalid monetary operation')
+        numerator, denominator = _fraction(other)
+        return self._scale(numerator, denominator * 100)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    #
+    # Comparison operators work element-wise and return a list of bools,
+    # except for equality which compares the arrays as a whole.
+    #
+
+    def _compare(self, other, op):
+        if isinstance(other, MoneyArray):
+            if self.currency != other.currency:
+                raise TypeError('can not compare different currencies')
+            if len(other.units) != len(self.units):
+                raise ValueError('arrays have different lengths')
+            return map(op, self.units, other.units)
+        if isinstance(other, Money):
+            if self.currency != other.currency:
+                raise TypeError('can not compare different currencies')
+            other = other.amount
+        numerator, denominator = _fraction(other)
+        # unit / 10**decimals <op> numerator / denominator
+        threshold = numerator * 10 ** self.currency.decimals
+        return [op(unit * denominator, threshold) for unit in self.units]
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    def __eq__(self, other):
+        if isinstance(other, MoneyArray):
+            return self.currency == other.currency and self.units == other.units
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    #
+    # Reductions
+    #
+
+    def allocate(self, ratios):
+        """
+        Splits every amount by the same ratios, like Money.allocate(). Returns
+        one MoneyArray per ratio, so result[i][j] is part i of amount j.
+        """
+        weights, total = _allocation_weights(ratios)
+        parts = [array(TYPECODE) for weight in weights]
+        appends = [part.append for part in parts]
+        for unit in self.units:
+            for append, share in zip(appends, _split_units(unit, weights, total)):
+                append(share)
+        return [self._wrap(part, self.currency) for part in parts]
+
+    def sum(self):
+        return Money(from_minor_units(sum(self.units), self.currency.decimals), self.currency)
+
+    def min(self):
+        return Money(from_minor_units(min(self.units), self.currency.decimals), self.currency)
+
+    def max(self):
+        return Money(from_minor_units(max(self.units), self.currency.decimals), self.currency)
+
+    #
+    # Conversion
+    #
+
+    def convert(self, rate, currency):
+        """
+        Converts every amount at the given rate into another currency,
+        rounding to that currency's minor unit.
+        """
+        currency = _currency(currency)
+        numerator, denominator = _fraction(rate)
+        numerator *= 10 ** currency.decimals
+        denominator *= 10 ** self.currency.decimals
+        result = self._scale(numerator, denominator)
+        result.currency = currency
+        return result
+
+    def convert_to(self, currency, rates=None, at=None):
+        """
+        Converts into another currency using the given or installed rate
+        source, like Money.convert_to().
+        """
+        currency = _currency(currency)
+        return self.convert(get_exchange_rate(self.currency, currency, rates, at), currency)
+
+    def convert_to_default(self):
+        if get_rate_source() is not None:
+            return self.convert_to(get_default_currency())
+        return self.convert(self.currency.exchange_rate, get_default_currency())
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+from Money import Money, Currency, CURRENCY, get_exchange_rate, _current_rates, _make
+
+__all__ = ('MoneyBag',)
+
+
+class MoneyBag(object):
+    """
+    Accumulates amounts in any number of currencies, keeping one exact total
+    per currency. Unlike adding Money in different currencies, nothing is
+    converted until convert_to() is called, and then only once per currency,
+    all with the same rates.
+
+        >>> bag = MoneyBag()
+        >>> bag += Money(10, 'USD')
+        >>> bag += Money(5, 'EUR')
+        >>> bag += Money(2, 'USD')
+        >>> bag
+        MoneyBag(EUR  5.00, USD 12.00)
+    """
+    def __init__(self, *moneys):
+        self._totals = {}
+        for money in moneys:
+            self.add(money)
+
+    def add(self, other):
+        """
+        Adds a Money or all of the totals of another MoneyBag.
+        """
+        totals = self._totals
+        if isinstance(other, Money):
+            currency = other.currency
+            totals[currency] = totals.get(currency, 0) + other.amount
+        elif isinstance(other, MoneyBag):
+            for currency, amount in other._totals.items():
+                totals[currency] = totals.get(currency, 0) + amount
+        else:
+            raise TypeError('can only add Money or MoneyBag to a MoneyBag')
+
+    def subtract(self, other):
+        self.add(-other)
+
+    def copy(self):
+        bag = MoneyBag()
+        bag._totals = self._totals.copy()
+        return bag
+
+    def __iadd__(self, other):
+        self.add(other)
+        return self
+
+    def __isub__(self, other):
+        self.subtract(other)
+        return self
+
+    def __add__(self, other):
+        bag = self.copy()
+        bag.add(other)
+        return bag
+
+    def __radd__(self, other):
+        # Lets sum() start from 0
+        if isinstance(other, (int, long)) and other == 0:
+            return self.copy()
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        bag = self.copy()
+        bag.subtract(other)
+        return bag
+
+    def __neg__(self):
+        bag = MoneyBag()
+        bag._totals = dict((currency, -amount) for currency, amount in self._totals.items())
+        return bag
+
+    #
+    # Access to the totals
+    #
+
+    def currencies(self):
+        return sorted(self._totals.keys(), key=lambda currency: currency.code)
+
+    def __getitem__(self, currency):
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        return _make(Decimal(self._totals.get(currency, 0)), currency)
+
+    def __contains__(self, currency):
+        if not isinstance(currency, Currency):
+            currency = CURRENCY.get(currency)
+        return currency in self._totals
+
+    def __iter__(self):
+        totals = self._totals
+        for currency in self.currencies():
+            yield _make(totals[currency], currency)
+
+    def __len__(self):
+        return len(self._totals)
+
+    def __nonzero__(self):
+        return any(self._totals.values())
+
+    def __eq__(self, other):
+        if isinstance(other, MoneyBag):
+            mine = dict(item for item in self._totals.items() if item[1])
+            theirs = dict(item for item in other._totals.items() if item[1])
+            return mine == theirs
+        if isinstance(other, Money):
+            return self == MoneyBag(other)
+        # Allow comparison to 0, like Money
+        return other == 0 and not self
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'MoneyBag(%s)' % ', '.join(repr(money) for money in self)
+
+    def convert_to(self, currency, rates=None, at=None):
+        """
+        Returns the total of the bag in one currency. Each currency is
+        converted once, using the given rate source or the installed one,
+        which is taken once for the whole bag.
+        """
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        if rates is None:
+            rates = _current_rates()
+        total = Decimal(0)
+        for source, amount in self._totals.items():
+            if source is not currency:
+                amount = amount * get_exchange_rate(source, currency, rates, at)
+            total += amount
+        return _make(total, currency)
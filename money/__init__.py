@@ -1 +1,4 @@
-from Money import *
\ No newline at end of file
+from Money import *
+from MoneyArray import *
+from MoneyBag import *
+from exchange import *
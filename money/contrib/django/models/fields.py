@@ -26,28 +26,44 @@ class MoneyFieldProxy(object):
     If the attribute is read, it builds the instance "on-demand" with the
     current data.
     (see: http://blog.elsdoerfer.name/2008/01/08/fuzzydates-or-one-django-model-field-multiple-database-columns/)
+
+    The Money that is built is cached in a separate attribute together with
+    the raw amount and currency it was built from, so repeated reads return
+    the same instance, and the raw values are left as they are for saving.
+    The cache is replaced on assignment and ignored as soon as either of the
+    raw values it was built from is no longer the current one.
     """
     def __init__(self, field):
         self.field = field
         self.currency_field_name = currency_field_name(self.field.name)
-
-    def _money_from_obj(self, obj):
-        return Money(obj.__dict__[self.field.name], obj.__dict__[self.currency_field_name])
+        self.cache_name = '_%s_cache' % self.field.name
 
     def __get__(self, obj, type=None):
         if obj is None:
             raise AttributeError('Can only be accessed via an instance.')
-        if not isinstance(obj.__dict__[self.field.name], Money):
-            obj.__dict__[self.field.name] = self._money_from_obj(obj)
-        return obj.__dict__[self.field.name]
+        values = obj.__dict__
+        amount = values[self.field.name]
+        currency = values[self.currency_field_name]
+        cached = values.get(self.cache_name)
+        if cached is not None and cached[0] is amount and cached[1] is currency:
+            return cached[2]
+        money = Money(amount, currency)
+        values[self.cache_name] = (amount, currency, money)
+        return money
 
     def __set__(self, obj, value):
+        if not isinstance(value, Money):
+            if value: value = str(value)
+            value = self.field.to_python(value)
+        values = obj.__dict__
         if isinstance(value, Money):
-            obj.__dict__[self.field.name] = value.amount
-            setattr(obj, self.currency_field_name, smart_unicode(value.currency))
+            currency = smart_unicode(value.currency)
+            values[self.field.name] = value.amount
+            setattr(obj, self.currency_field_name, currency)
+            values[self.cache_name] = (value.amount, currency, value)
         else:
-            if value: value = str(value)
-            obj.__dict__[self.field.name] = self.field.to_python(value)
+            values[self.field.name] = value
+            values.pop(self.cache_name, None)
 
 
 class CurrencyField(models.CharField):
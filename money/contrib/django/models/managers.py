@@ -1,11 +1,33 @@
-from django.db import models
+import copy
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.expressions import ExpressionNode
 from django.db.models.query import QuerySet
 from django.utils.encoding import smart_unicode
-from fields import currency_field_name
+from fields import currency_field_name, MoneyField
 
 __all__ = ('QuerysetWithMoney', 'MoneyManager',)
 
 
+def _combine(kind, results, currency):
+    """
+    Combines (Money, row count) results of an aggregate in one currency into
+    one: added up for Sum, weighted by the number of rows for Avg and
+    compared for Min and Max.
+    """
+    from money import Money
+    moneys = [money for money, count in results]
+    if kind == 'Avg':
+        total = sum(money.amount * count for money, count in results)
+        count = sum(count for money, count in results)
+        return Money(total / count, currency), count
+    if kind == 'Sum':
+        return Money.sum(moneys, currency), None
+    if kind == 'Min':
+        return min(moneys), None
+    return max(moneys), None
+
+
 class QuerysetWithMoney(QuerySet):
     
     def _update_params(self, kwargs):
@@ -79,7 +101,234 @@ class QuerysetWithMoney(QuerySet):
         kwargs = self._update_params(kwargs)
         return super(QuerysetWithMoney, self).values(*args, **kwargs)
 
+    def _money_expression(self, node, money_fields, references, currencies):
+        """
+        Returns a copy of an F() expression with every Money replaced by its
+        amount. The names of the MoneyFields it refers to are appended to
+        references and the currencies of the Money are added to currencies.
+        """
+        from money import Money
+        if isinstance(node, F):
+            if node.name in money_fields and node.name not in references:
+                references.append(node.name)
+            return node
+        if isinstance(node, ExpressionNode):
+            children = []
+            for child in node.children:
+                if isinstance(child, Money):
+                    if node.connector not in (ExpressionNode.ADD, ExpressionNode.SUB):
+                        raise TypeError('can only add or subtract Money in an update')
+                    currencies.add(child.currency)
+                    child = child.amount
+                else:
+                    child = self._money_expression(child, money_fields, references, currencies)
+                children.append(child)
+            node = copy.copy(node)
+            node.children = children
+        return node
+
+    def update(self, **kwargs):
+        """
+        Like QuerySet.update(), with MoneyFields. Setting a MoneyField to a
+        Money writes its currency too.
+
+        An F() expression is computed in the database. Money in it, as in
+        F('price') + Money(1, 'USD'), is written as its amount and only the
+        rows in that currency are updated. The MoneyFields it refers to must
+        all be in the same currency, so the rows where they are not are left
+        out, and the currency of the result is written with it. TypeError is
+        raised for an expression with Money in different currencies or one
+        that multiplies or divides Money.
+        """
+        from money import Money
+        money_fields = set(field.name for field in self.model._meta.fields if isinstance(field, MoneyField))
+        queryset = self
+        values = dict(kwargs)
+        for name, value in kwargs.items():
+            if name not in money_fields:
+                continue
+            currency_name = currency_field_name(name)
+            currency = None
+            if isinstance(value, Money):
+                values[name] = value.amount
+                currency = value.currency
+            elif isinstance(value, ExpressionNode):
+                references = []
+                currencies = set()
+                values[name] = self._money_expression(value, money_fields, references, currencies)
+                if len(currencies) > 1:
+                    raise TypeError('can not mix currencies in an update of %s' % name)
+                if currencies:
+                    currency = currencies.pop()
+                    for reference in references:
+                        queryset = queryset.filter(**{currency_field_name(reference): smart_unicode(currency)})
+                elif references:
+                    first = currency_field_name(references[0])
+                    for reference in references[1:]:
+                        queryset = queryset.filter(**{currency_field_name(reference): F(first)})
+                    if name not in references:
+                        values.setdefault(currency_name, F(first))
+            if currency is not None:
+                currency = smart_unicode(currency)
+                if smart_unicode(values.setdefault(currency_name, currency)) != currency:
+                    raise TypeError('can not set %s in %s to %s' % (name, currency, currency_name))
+        return super(QuerysetWithMoney, queryset).update(**values)
+
+    def _set_default_currency(self, objs, default_currency):
+        """
+        Fills in the currency of every MoneyField that has none: the given
+        default currency, or else the field's, or else the default currency.
+        """
+        from money import Money, get_default_currency
+        for field in self.model._meta.local_fields:
+            if not isinstance(field, MoneyField):
+                continue
+            currency = default_currency or field.default_currency
+            if not currency and isinstance(field.default, Money):
+                currency = field.default.currency
+            currency = smart_unicode(currency or get_default_currency())
+            name = currency_field_name(field.name)
+            for obj in objs:
+                if not obj.__dict__.get(name):
+                    setattr(obj, name, currency)
+
+    def bulk_create(self, objs, batch_size=None, default_currency=None):
+        """
+        Like QuerySet.bulk_create(), but the objects' MoneyFields that have
+        no currency get default_currency, or else the field's default
+        currency or the default currency.
+        """
+        objs = list(objs)
+        self._set_default_currency(objs, default_currency)
+        return super(QuerysetWithMoney, self).bulk_create(objs, batch_size)
+
+    def bulk_update(self, objs, fields, batch_size=None, default_currency=None):
+        """
+        Saves the given fields of many objects with one UPDATE query per
+        batch, instead of one save() per object. A MoneyField in fields
+        saves both its amount and its currency, and a missing currency is
+        filled in like in bulk_create(). The batch size defaults to the
+        most the database backend allows. Like bulk_create(), it does not
+        call save() or send signals. Returns the number of rows updated.
+        """
+        objs = list(objs)
+        if not objs:
+            return 0
+        if any(obj.pk is None for obj in objs):
+            raise ValueError("bulk_update() needs objects that have a primary key")
+        self._set_default_currency(objs, default_currency)
+
+        opts = self.model._meta
+        columns = []
+        for name in fields:
+            field = opts.get_field(name)
+            columns.append(field)
+            if isinstance(field, MoneyField):
+                columns.append(opts.get_field(currency_field_name(field.name)))
+
+        self._for_write = True
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        pk = opts.pk
+        if batch_size is None:
+            # Every column takes a primary key and a value per object, and
+            # the WHERE clause one more primary key
+            batch_size = connection.ops.bulk_batch_size([None] * (2 * len(columns) + 1), objs)
+        batch_size = max(batch_size, 1)
+        # PostgreSQL can not infer the type of the values in a CASE
+        templates = []
+        for field in columns:
+            if connection.vendor == 'postgresql':
+                templates.append('WHEN %%s THEN CAST(%%s AS %s)' % field.db_type(connection))
+            else:
+                templates.append('WHEN %s THEN %s')
+
+        if not transaction.is_managed(using=self.db):
+            transaction.enter_transaction_management(using=self.db)
+            forced_managed = True
+        else:
+            forced_managed = False
+        try:
+            cursor = connection.cursor()
+            updated = 0
+            for start in range(0, len(objs), batch_size):
+                batch = objs[start:start + batch_size]
+                keys = [pk.get_db_prep_value(obj.pk, connection) for obj in batch]
+                assignments = []
+                params = []
+                for field, template in zip(columns, templates):
+                    assignments.append('%s = CASE %s %s END' % (
+                        quote(field.column), quote(pk.column), ' '.join([template] * len(batch))))
+                    for key, obj in zip(keys, batch):
+                        params.append(key)
+                        params.append(field.get_db_prep_save(field.pre_save(obj, False), connection=connection))
+                sql = 'UPDATE %s SET %s WHERE %s IN (%s)' % (
+                    quote(opts.db_table), ', '.join(assignments), quote(pk.column), ', '.join(['%s'] * len(batch)))
+                cursor.execute(sql, params + keys)
+                updated += cursor.rowcount
+            if forced_managed:
+                transaction.commit(using=self.db)
+            else:
+                transaction.commit_unless_managed(using=self.db)
+        finally:
+            if forced_managed:
+                transaction.leave_transaction_management(using=self.db)
+        return updated
+
+    def money_aggregate(self, field, aggregate=Sum, currency=None, rates=None):
+        """
+        Aggregates a MoneyField with Sum, Avg, Min or Max in the database,
+        with one query grouped by the currency column. Returns a dict of
+        {Currency: Money} with the result for every currency. Rows without
+        a currency are counted in the default currency.
+
+        If a currency is given, the results are converted into it, using the
+        given rate source or the one installed at the time of the call, and
+        combined into a single Money: added up for Sum, weighted by the
+        number of rows for Avg and compared for Min and Max. None is
+        returned if there are no rows.
+        """
+        from money import Money, CURRENCY, Currency
+        from money.Money import _current_rates
+        kind = getattr(aggregate, 'name', None)
+        if kind not in ('Sum', 'Avg', 'Min', 'Max'):
+            raise ValueError('money_aggregate supports Sum, Avg, Min and Max, not %r' % aggregate)
+        currency_name = currency_field_name(field)
+        annotations = {'money_aggregate': aggregate(field)}
+        if kind == 'Avg':
+            annotations['money_count'] = Count(field)
+        rows = self.order_by().values(currency_name).annotate(**annotations)
+
+        results = {}
+        for row in rows:
+            if row['money_aggregate'] is None:
+                continue
+            # Rows with an empty or NULL currency are in the default currency,
+            # so their group is combined with that of the default currency
+            money = Money(row['money_aggregate'], row[currency_name])
+            result = (money, row.get('money_count'))
+            if money.currency in results:
+                result = _combine(kind, [results[money.currency], result], money.currency)
+            results[money.currency] = result
+        if currency is None:
+            return dict((source, money) for source, (money, count) in results.items())
+        if not results:
+            return None
+
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        if rates is None:
+            rates = _current_rates()
+        converted = [(money.convert_to(currency, rates), count) for money, count in results.values()]
+        return _combine(kind, converted, currency)[0]
+
 
 class MoneyManager(models.Manager):
     def get_query_set(self):
         return QuerysetWithMoney(self.model)
+
+    def money_aggregate(self, *args, **kwargs):
+        return self.get_query_set().money_aggregate(*args, **kwargs)
+
+    def bulk_update(self, *args, **kwargs):
+        return self.get_query_set().bulk_update(*args, **kwargs)
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_right
+from collections import deque
+from decimal import Decimal
+from operator import itemgetter
+from Money import Currency, CURRENCY, get_exchange_rate, _current_rates, _make, _to_decimal
+
+__all__ = ('RateTable', 'RateSnapshot', 'HistoricalRates', 'ExchangeRateNotFound', 'convert_many', 'iconvert_many')
+
+ONE = Decimal(1)
+
+
+class ExchangeRateNotFound(KeyError):
+    def __init__(self, source, target):
+        KeyError.__init__(self, source, target)
+        self.source = source
+        self.target = target
+    def __str__(self):
+        return "No exchange rate from %s to %s" % (self.source, self.target)
+
+
+def _currency(currency):
+    if isinstance(currency, Currency):
+        return currency
+    return CURRENCY[currency]
+
+def _positive(rate):
+    rate = _to_decimal(rate)
+    if rate <= 0:
+        raise ValueError("exchange rate must be positive, not %s" % rate)
+    return rate
+
+
+def iconvert_many(moneys, currency, rates=None, at=None):
+    """
+    Converts an iterable of Money into one currency, yielding the results
+    lazily in the original order. The rate for each source currency is looked
+    up once, from the given rate source or else the installed one, so the
+    whole batch is converted with one consistent set of rates. The installed
+    source is taken once, when the first item is converted, so installing
+    another one in the middle of the batch does not affect it.
+    """
+    currency = _currency(currency)
+    if rates is None:
+        rates = _current_rates()
+    cache = {currency: None}
+    for money in moneys:
+        source = money.currency
+        try:
+            rate = cache[source]
+        except KeyError:
+            rate = cache[source] = get_exchange_rate(source, currency, rates, at)
+        if rate is None:
+            yield money
+        else:
+            yield _make(money.amount * rate, currency)
+
+def convert_many(moneys, currency, rates=None, at=None):
+    """
+    Like iconvert_many(), but returns a list.
+    """
+    return list(iconvert_many(moneys, currency, rates, at))
+
+
+class RateTable(object):
+    """
+    Pairwise exchange rates plus every cross rate that can be derived from
+    them.
+
+    A rate for (source, target) is the price of one unit of source in target
+    and implies the inverse rate unless that is given as well. Cross rates go
+    through the shortest chain of known rates, preferring the base currency
+    when there is a choice. The full matrix is rebuilt whenever rates change,
+    so rate() is just two dict lookups. The rebuilt matrix replaces the old
+    one in a single assignment, so readers never see a half updated table.
+
+    Install a table with money.set_rate_source(table) to use it for
+    Money.convert_to() and convert_to_default().
+    """
+    def __init__(self, rates=None, base=None):
+        self.base = base and _currency(base)
+        self._rates = {}
+        self._matrix = {}
+        if rates:
+            self.set_rates(rates)
+
+    def set_rate(self, source, target, rate):
+        self.set_rates([(source, target, rate)])
+
+    def set_rates(self, rates):
+        """
+        Sets several rates at once, given as (source, target, rate) triples
+        or as a dict of {(source, target): rate}. The cross rates are only
+        rebuilt once.
+        """
+        if isinstance(rates, dict):
+            rates = [(source, target, rate) for (source, target), rate in rates.items()]
+        for source, target, rate in rates:
+            self._rates[(_currency(source), _currency(target))] = _positive(rate)
+        self._rebuild()
+
+    def remove_rate(self, source, target):
+        del self._rates[(_currency(source), _currency(target))]
+        self._rebuild()
+
+    def clear(self):
+        self._rates.clear()
+        self._rebuild()
+
+    def _rebuild(self):
+        graph = {}
+        for (source, target), rate in self._rates.items():
+            graph.setdefault(source, {})[target] = rate
+        for (source, target), rate in self._rates.items():
+            graph.setdefault(target, {}).setdefault(source, ONE / rate)
+
+        base = self.base
+        matrix = {}
+        for origin in graph:
+            # Breadth first, so every rate uses the fewest conversions
+            rates = {origin: ONE}
+            queue = deque([origin])
+            while queue:
+                current = queue.popleft()
+                neighbours = graph[current]
+                targets = neighbours.keys()
+                if base in neighbours:
+                    targets.remove(base)
+                    targets.insert(0, base)
+                for target in targets:
+                    if target not in rates:
+                        rates[target] = rates[current] * neighbours[target]
+                        queue.append(target)
+            matrix[origin] = rates
+        self._matrix = matrix
+
+    def rate(self, source, target):
+        """
+        Returns the rate for converting from source to target. Raises
+        ExchangeRateNotFound if the two currencies are not connected.
+        """
+        try:
+            return self._matrix[source][target]
+        except KeyError:
+            pass
+        source, target = _currency(source), _currency(target)
+        if source is target:
+            return ONE
+        try:
+            return self._matrix[source][target]
+        except KeyError:
+            raise ExchangeRateNotFound(source, target)
+
+    def convert(self, money, currency):
+        return money.convert_to(currency, rates=self)
+
+    def currencies(self):
+        return self._matrix.keys()
+
+
+class RateSnapshot(RateTable):
+    """
+    A RateTable that can not be changed after it is built. Anything that
+    holds on to a snapshot, like a request converting several amounts, sees
+    one consistent set of rates for as long as it keeps it.
+    """
+    def __init__(self, rates=None, base=None):
+        RateTable.__init__(self, base=base)
+        if rates:
+            RateTable.set_rates(self, rates)
+
+    def _frozen(self, *args):
+        raise TypeError('rate snapshots can not be changed')
+
+    set_rate = set_rates = remove_rate = clear = _frozen
+
+
+class _Series(object):
+    """
+    The rates of one currency pair, sorted by the date they take effect.
+    """
+    __slots__ = ('dates', 'rates', '_inverses')
+
+    def __init__(self):
+        self.dates = []
+        self.rates = []
+        self._inverses = None
+
+    def add(self, effective, rate):
+        self.dates.append(effective)
+        self.rates.append(rate)
+
+    def sort(self):
+        # A stable sort keeps the last rate given for a date in last place
+        entries = sorted(zip(self.dates, self.rates), key=itemgetter(0))
+        dates, rates = [], []
+        for effective, rate in entries:
+            if dates and dates[-1] == effective:
+                rates[-1] = rate
+            else:
+                dates.append(effective)
+                rates.append(rate)
+        self.dates, self.rates, self._inverses = dates, rates, None
+
+    def values(self, inverse):
+        if not inverse:
+            return self.rates
+        if self._inverses is None:
+            self._inverses = [ONE / rate for rate in self.rates]
+        return self._inverses
+
+    def index(self, at):
+        if at is None:
+            return len(self.dates) - 1
+        return bisect_right(self.dates, at) - 1
+
+
+class _Cursor(object):
+    """
+    Walks forward through the series of a conversion path as the requested
+    timestamps increase.
+    """
+    def __init__(self, legs):
+        self.legs = legs
+        self.positions = [-1] * len(legs)
+        self.at = None
+        self.value = None
+
+    def rate(self, at):
+        if at == self.at:
+            return self.value
+        rewind = self.at is not None and at < self.at
+        value = ONE
+        for i, (series, inverse) in enumerate(self.legs):
+            dates = series.dates
+            if rewind:
+                position = bisect_right(dates, at) - 1
+            else:
+                position = self.positions[i]
+                last = len(dates) - 1
+                while position < last and dates[position + 1] <= at:
+                    position += 1
+            self.positions[i] = position
+            if position < 0:
+                raise LookupError(at)
+            value *= series.values(inverse)[position]
+        self.at, self.value = at, value
+        return value
+
+
+class HistoricalRates(object):
+    """
+    Exchange rates that change over time.
+
+    Every currency pair keeps its rates sorted by effective date. A rate
+    applies from its effective date until the next one, and rate() finds it
+    with a binary search. Pairs without a rate of their own use the inverse
+    rate or go through the base currency. Effective dates can be anything
+    that compares consistently: dates, datetimes, timestamps.
+
+    Install it with money.set_rate_source() to use Money.convert_to(currency,
+    at=timestamp); without a timestamp the latest rates are used.
+    """
+    def __init__(self, rates=None, base=None):
+        self.base = base and _currency(base)
+        self._series = {}
+        self._paths = {}
+        if rates:
+            self.set_rates(rates)
+
+    def set_rate(self, source, target, rate, effective):
+        self.set_rates([(source, target, rate, effective)])
+
+    def set_rates(self, rates):
+        """
+        Adds rates given as (source, target, rate, effective) tuples. Each
+        touched series is sorted once, and a rate for an existing date
+        replaces the old one.
+        """
+        touched = set()
+        for source, target, rate, effective in rates:
+            key = (_currency(source), _currency(target))
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(effective, _positive(rate))
+            touched.add(series)
+        for series in touched:
+            series.sort()
+        self._paths.clear()
+
+    def _leg(self, source, target):
+        if (source, target) in self._series:
+            return [(self._series[(source, target)], False)]
+        if (target, source) in self._series:
+            return [(self._series[(target, source)], True)]
+        return None
+
+    def _legs(self, source, target):
+        """
+        Returns the series, and whether to invert them, that convert from
+        source to target.
+        """
+        key = (source, target)
+        try:
+            legs = self._paths[key]
+        except KeyError:
+            legs = self._leg(source, target)
+            base = self.base
+            if legs is None and base is not None and base is not source and base is not target:
+                first, second = self._leg(source, base), self._leg(base, target)
+                legs = first and second and first + second
+            self._paths[key] = legs
+        if legs is None:
+            raise ExchangeRateNotFound(source, target)
+        return legs
+
+    def rate(self, source, target, at=None):
+        """
+        Returns the rate that applied at the given time, or the latest rate.
+        Raises ExchangeRateNotFound if there is no rate for the pair at that
+        time.
+        """
+        source, target = _currency(source), _currency(target)
+        if source is target:
+            return ONE
+        rate = ONE
+        for series, inverse in self._legs(source, target):
+            index = series.index(at)
+            if index < 0:
+                raise ExchangeRateNotFound(source, target)
+            rate *= series.values(inverse)[index]
+        return rate
+
+    def convert_sorted(self, items, currency):
+        """
+        Converts (timestamp, Money) pairs sorted by timestamp and yields the
+        converted amounts in the same order.
+
+        Instead of a binary search per item, each source currency gets a
+        cursor that moves forward through its rate series as the timestamps
+        advance, so the batch is converted in one merge-style pass. Unsorted
+        input still gives correct results, just more slowly. A timestamp of
+        None uses the latest rates, like rate() does.
+        """
+        currency = _currency(currency)
+        cursors = {}
+        latest = {}
+        for at, money in items:
+            source = money.currency
+            if source is currency:
+                yield money
+                continue
+            if at is None:
+                rate = latest.get(source)
+                if rate is None:
+                    rate = latest[source] = self.rate(source, currency)
+                yield _make(money.amount * rate, currency)
+                continue
+            cursor = cursors.get(source)
+            if cursor is None:
+                cursor = cursors[source] = _Cursor(self._legs(source, currency))
+            try:
+                rate = cursor.rate(at)
+            except LookupError:
+                raise ExchangeRateNotFound(source, currency)
+            yield _make(money.amount * rate, currency)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from Money import Currency, CURRENCY, _fixed
+
+__all__ = ('MoneyFormatter', 'LOCALES', 'get_formatter', 'format_money', 'format_many')
+
+# The conventions of each locale: decimal point, thousands separator, whether
+# the currency goes before the number and whether a space separates them.
+LOCALES = {
+    'en_US': (u'.', u',', True, False),
+    'en_GB': (u'.', u',', True, False),
+    'ja_JP': (u'.', u',', True, False),
+    'de_DE': (u',', u'.', False, True),
+    'nl_NL': (u',', u'.', True, True),
+    'fr_FR': (u',', u' ', False, True),
+    'ru_RU': (u',', u' ', False, True),
+    'de_CH': (u'.', u"'", True, True),
+}
+DEFAULT_LOCALE = 'en_US'
+
+STYLES = ('symbol', 'code', 'plain')
+
+
+class MoneyFormatter(object):
+    """
+    Formats amounts of one currency for one locale and style.
+
+    Everything that does not depend on the amount (separators, the symbol or
+    code and where it goes) is worked out once in the constructor. Amounts
+    are rounded half to even to the currency's decimal places and rendered
+    from their exact digits, never through a float.
+
+    The styles are 'symbol' (u'$1,234.56', falling back to the code for
+    currencies without a symbol), 'code' (u'USD 1,234.56') and 'plain'
+    (u'1,234.56').
+    """
+    def __init__(self, currency, locale=None, style='symbol'):
+        if not isinstance(currency, Currency):
+            currency = CURRENCY[currency]
+        try:
+            decimal_point, thousands, before, space = LOCALES[locale or DEFAULT_LOCALE]
+        except KeyError:
+            raise ValueError("unknown locale %r" % locale)
+        if style == 'symbol' and currency.symbol:
+            label = currency.symbol
+        elif style in ('symbol', 'code'):
+            label, space = currency.code, True
+        elif style == 'plain':
+            label = u''
+        else:
+            raise ValueError("unknown style %r" % style)
+
+        if not label:
+            template = u'%s'
+        elif before:
+            template = label + (u' ' if space else u'') + u'%s'
+        else:
+            template = u'%s' + (u' ' if space else u'') + label
+        self.currency = currency
+        self.places = currency.decimals
+        self.decimal_point = decimal_point
+        self.thousands = thousands
+        self._positive = template
+        self._negative = u'-' + template
+
+    def format_amount(self, amount):
+        negative, whole, fraction = _fixed(amount, self.places)
+        number = format(whole, ',')
+        if self.thousands != u',':
+            number = number.replace(',', self.thousands)
+        if fraction:
+            number = number + self.decimal_point + fraction
+        return (self._negative if negative else self._positive) % number
+
+    def __call__(self, money):
+        if money.currency is not self.currency:
+            raise TypeError('can not format %s with a formatter for %s' % (money.currency, self.currency))
+        return self.format_amount(money.amount)
+
+
+_FORMATTERS = {}
+
+def get_formatter(currency, locale=None, style='symbol'):
+    """
+    Returns the MoneyFormatter for a currency, locale and style. Formatters
+    are built on first use and cached.
+    """
+    if not isinstance(currency, Currency):
+        currency = CURRENCY[currency]
+    key = (currency, locale or DEFAULT_LOCALE, style)
+    try:
+        return _FORMATTERS[key]
+    except KeyError:
+        formatter = _FORMATTERS[key] = MoneyFormatter(currency, locale, style)
+        return formatter
+
+def format_money(money, locale=None, style='symbol'):
+    """
+    Formats a Money for display, e.g. u'$1,234.56' or u'1.234,56 €'.
+    """
+    return get_formatter(money.currency, locale, style)(money)
+
+def format_many(moneys, locale=None, style='symbol'):
+    """
+    Formats an iterable of Money and returns a list of strings. The
+    formatter of each currency is only looked up once.
+    """
+    formatters = {}
+    results = []
+    append = results.append
+    for money in moneys:
+        currency = money.currency
+        formatter = formatters.get(currency)
+        if formatter is None:
+            formatter = formatters[currency] = get_formatter(currency, locale, style)
+        append(formatter.format_amount(money.amount))
+    return results
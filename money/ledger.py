@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import izip
+from Money import Currency, CURRENCY, to_minor_units, from_minor_units, _make
+from MoneyArray import MoneyArray, TYPECODE
+from MoneyBag import MoneyBag
+from wire import _numeric
+
+__all__ = ('LedgerWriter', 'Ledger')
+
+# A ledger file starts with MAGIC, followed by blocks of rows. Every block
+# has a header with BLOCK_MAGIC and the number of rows, then the columns one
+# after the other: timestamps, accounts and amounts in minor units as 64 bit
+# integers, and ISO 4217 numeric currency codes as 16 bit integers. Blocks
+# are padded to a multiple of 8 bytes. Everything is little endian.
+MAGIC = 'MLEDGER1'
+BLOCK = struct.Struct('<4sI')
+BLOCK_MAGIC = 'BLCK'
+ROW_SIZE = 8 + 8 + 8 + 2
+
+TIMESTAMPS, ACCOUNTS, AMOUNTS, CURRENCIES = range(4)
+
+_SWAP = sys.byteorder != 'little'
+
+def _check_typecode():
+    if array(TYPECODE).itemsize != 8:
+        raise NotImplementedError('ledger files need 64 bit integer arrays')
+
+def _block_size(count):
+    size = BLOCK.size + count * ROW_SIZE
+    return size + (-size % 8)
+
+def _currency(currency):
+    if isinstance(currency, Currency):
+        return currency
+    return CURRENCY[currency]
+
+def _scan(header, size, path):
+    """
+    Finds the complete blocks of a ledger file of the given size, reading
+    the block header at an offset with header(offset). Returns a list of
+    (offset, first row, row count) tuples and the offset where the last
+    complete block ends.
+    """
+    blocks = []
+    offset = len(MAGIC)
+    rows = 0
+    while offset + BLOCK.size <= size:
+        magic, count = header(offset)
+        if magic != BLOCK_MAGIC:
+            raise ValueError('%s is corrupt at byte %d' % (path, offset))
+        end = offset + _block_size(count)
+        if end > size:
+            break
+        blocks.append((offset, rows, count))
+        rows += count
+        offset = end
+    return blocks, offset
+
+
+class LedgerWriter(object):
+    """
+    Appends (timestamp, account, Money) rows to a ledger file, creating it
+    if needed. Timestamps (e.g. seconds since the epoch) and account numbers
+    are integers. Amounts are stored in minor units of their currency, so
+    ValueError is raised for an amount with more decimal places than the
+    currency has, and currencies as their numeric code, so ValueError is
+    raised for a currency that has none of its own.
+
+    Rows are buffered and written one block at a time, with a single write,
+    every block_size rows and on flush() or close(). A block that was only
+    partly written, e.g. after a crash, is ignored by readers and cut off
+    when the file is opened for writing again.
+    """
+    def __init__(self, path, block_size=65536):
+        _check_typecode()
+        self.block_size = block_size
+        self._file = open(path, 'a+b')
+        try:
+            self._truncate(path)
+        except:
+            self._file.close()
+            raise
+        self._numerics = {}
+        self._clear()
+
+    def _truncate(self, path):
+        f = self._file
+        size = os.fstat(f.fileno()).st_size
+        f.seek(0)
+        magic = f.read(len(MAGIC))
+        if not MAGIC.startswith(magic):
+            raise ValueError('%s is not a ledger file' % path)
+        if size < len(MAGIC):
+            f.truncate(0)
+            f.write(MAGIC)
+            return
+        def header(offset):
+            f.seek(offset)
+            return BLOCK.unpack(f.read(BLOCK.size))
+        blocks, end = _scan(header, size, path)
+        if end < size:
+            f.truncate(end)
+
+    def _clear(self):
+        self._columns = (array(TYPECODE), array(TYPECODE), array(TYPECODE), array('H'))
+
+    def append(self, timestamp, account, money):
+        currency = money.currency
+        amount = to_minor_units(money.amount, currency.decimals)
+        numeric = self._numerics.get(currency)
+        if numeric is None:
+            numeric = self._numerics[currency] = _numeric(currency)
+        timestamps, accounts, amounts, currencies = self._columns
+        timestamps.append(timestamp)
+        accounts.append(account)
+        amounts.append(amount)
+        currencies.append(numeric)
+        if len(amounts) >= self.block_size:
+            self.flush()
+
+    def extend(self, rows):
+        for timestamp, account, money in rows:
+            self.append(timestamp, account, money)
+
+    def flush(self):
+        columns = self._columns
+        count = len(columns[AMOUNTS])
+        if not count:
+            return
+        if _SWAP:
+            for column in columns:
+                column.byteswap()
+        data = BLOCK.pack(BLOCK_MAGIC, count) + ''.join(column.tostring() for column in columns)
+        self._file.write(data + '\0' * (-len(data) % 8))
+        self._file.flush()
+        self._clear()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Ledger(object):
+    """
+    A read-only view of a ledger file, memory mapped rather than read into
+    memory.
+
+    Sums, totals and amounts are computed from the integer columns of each
+    block, without building a Money per row. Money, MoneyArray and MoneyBag
+    objects are only created for the results. Slicing a ledger gives a
+    ledger for a range of rows that shares the same mapping.
+    """
+    def __init__(self, path):
+        _check_typecode()
+        self.path = path
+        with open(path, 'rb') as f:
+            # mmap can not map an empty file
+            if os.fstat(f.fileno()).st_size < len(MAGIC):
+                raise ValueError('%s is not a ledger file' % path)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a ledger file' % path)
+        try:
+            self._blocks = _scan(lambda offset: BLOCK.unpack_from(self._map, offset), len(self._map), path)[0]
+        except ValueError:
+            self._map.close()
+            raise
+        self._start = 0
+        self._stop = sum(count for offset, first, count in self._blocks)
+        self._currencies = {}
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __reduce__(self):
+        # Pickled as the file and the range of rows, so that another process
+        # can map the same rows
+        return (_open, (self.path, self._start, self._stop))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('ledger slices must be contiguous')
+            view = object.__new__(Ledger)
+            view.__dict__.update(self.__dict__)
+            view._start = self._start + start
+            view._stop = self._start + max(start, stop)
+            return view
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ledger index out of range')
+        return iter(self[index:index + 1]).next()
+
+    def _currency(self, numeric):
+        currency = self._currencies.get(numeric)
+        if currency is None:
+            currency = self._currencies[numeric] = CURRENCY.by_numeric(numeric)
+        return currency
+
+    def _column(self, offset, count, which, low, high):
+        start = offset + BLOCK.size + which * 8 * count
+        if which == CURRENCIES:
+            column, size = array('H'), 2
+        else:
+            column, size = array(TYPECODE), 8
+        column.fromstring(self._map[start + low * size:start + high * size])
+        if _SWAP:
+            column.byteswap()
+        return column
+
+    def _chunks(self, *which):
+        """
+        Yields the requested columns of the rows in the view, one block at a
+        time.
+        """
+        for offset, first, count in self._blocks:
+            if first >= self._stop:
+                break
+            low = max(self._start, first) - first
+            high = min(self._stop, first + count) - first
+            if low < high:
+                yield [self._column(offset, count, column, low, high) for column in which]
+
+    def _filtered(self, currency, which):
+        """
+        Yields the given column of the rows in one currency, one block at a
+        time.
+        """
+        numeric = int(currency.numeric)
+        for codes, values in self._chunks(CURRENCIES, which):
+            matches = codes.count(numeric)
+            if matches == len(codes):
+                yield values
+            elif matches:
+                yield array(values.typecode, [value for code, value in izip(codes, values) if code == numeric])
+
+    def timestamps(self):
+        result = array(TYPECODE)
+        for column, in self._chunks(TIMESTAMPS):
+            result.extend(column)
+        return result
+
+    def accounts(self):
+        result = array(TYPECODE)
+        for column, in self._chunks(ACCOUNTS):
+            result.extend(column)
+        return result
+
+    def currencies(self):
+        """
+        Returns the currencies that occur in the ledger, sorted by code.
+        """
+        numerics = set()
+        for codes, in self._chunks(CURRENCIES):
+            numerics.update(codes)
+        return sorted((self._currency(numeric) for numeric in numerics), key=lambda currency: currency.code)
+
+    def sum(self, currency):
+        """
+        Returns the total of the rows in one currency as a Money.
+        """
+        currency = _currency(currency)
+        total = sum(sum(amounts) for amounts in self._filtered(currency, AMOUNTS))
+        return _make(from_minor_units(total, currency.decimals), currency)
+
+    def totals(self):
+        """
+        Returns the totals of all currencies as a MoneyBag.
+        """
+        totals = {}
+        for codes, amounts in self._chunks(CURRENCIES, AMOUNTS):
+            first = codes[0]
+            if codes.count(first) == len(codes):
+                totals[first] = totals.get(first, 0) + sum(amounts)
+            else:
+                for code, amount in izip(codes, amounts):
+                    totals[code] = totals.get(code, 0) + amount
+        bag = MoneyBag()
+        for numeric, total in totals.items():
+            currency = self._currency(numeric)
+            bag.add(_make(from_minor_units(total, currency.decimals), currency))
+        return bag
+
+    def amounts(self, currency):
+        """
+        Returns the amounts of the rows in one currency as a MoneyArray.
+        """
+        currency = _currency(currency)
+        units = array(TYPECODE)
+        for amounts in self._filtered(currency, AMOUNTS):
+            units.extend(amounts)
+        return MoneyArray._wrap(units, currency)
+
+    def rows(self, currency=None):
+        """
+        Yields (timestamp, account, Money) for every row, or only the rows in
+        the given currency.
+        """
+        numeric = currency and int(_currency(currency).numeric)
+        for timestamps, accounts, amounts, codes in self._chunks(TIMESTAMPS, ACCOUNTS, AMOUNTS, CURRENCIES):
+            for timestamp, account, amount, code in izip(timestamps, accounts, amounts, codes):
+                if numeric is None or code == numeric:
+                    found = self._currency(code)
+                    yield timestamp, account, _make(from_minor_units(amount, found.decimals), found)
+
+    def __iter__(self):
+        return self.rows()
+
+
+def _open(path, start, stop):
+    return Ledger(path)[start:stop]
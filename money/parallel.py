@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+from array import array
+from itertools import count
+from Money import Currency, CURRENCY, get_default_currency, get_exchange_rate
+from Money import _allocation_weights, _current_rates, _fraction, _from_units, _make, _split_units, _units
+from MoneyArray import MoneyArray, TYPECODE, _round_div
+from MoneyBag import MoneyBag
+from ledger import Ledger, AMOUNTS, CURRENCIES
+from wire import RECORD, _numeric
+
+# concurrent.futures is only in the standard library from Python 3.2 on, but
+# the backport is used when it is installed.
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+__all__ = ('parallel_sum', 'parallel_totals', 'parallel_convert', 'parallel_allocate')
+
+CHUNK_SIZE = 100000
+
+_BUFFERS = (str, bytearray, buffer, memoryview)
+
+# The input of every call in progress, by token. The worker processes are
+# forked after the input is added, so where there is fork() they read their
+# part of it from their copy of this process's memory and nothing has to be
+# pickled and sent to them.
+_INPUTS = {}
+_TOKENS = count()
+_FORK = hasattr(os, 'fork')
+
+
+def _currency(currency):
+    if isinstance(currency, Currency):
+        return currency
+    return CURRENCY[currency]
+
+def _prepare(data):
+    """
+    Returns the input as something that can be sliced: a sequence of Money,
+    a buffer of money.wire records or a Ledger.
+    """
+    if isinstance(data, _BUFFERS + (Ledger,)) or hasattr(data, '__getitem__'):
+        return data
+    return list(data)
+
+def _length(data):
+    if isinstance(data, _BUFFERS):
+        records, extra = divmod(len(data), RECORD.size)
+        if extra:
+            raise ValueError('buffer is not a whole number of records')
+        return records
+    return len(data)
+
+def _slice(data, start, stop):
+    if isinstance(data, memoryview):
+        return data[start * RECORD.size:stop * RECORD.size].tobytes()
+    if isinstance(data, _BUFFERS):
+        return str(data[start * RECORD.size:stop * RECORD.size])
+    # Slices of a Ledger are pickled as its path and the range of rows
+    return data[start:stop]
+
+def _map(function, payloads, workers):
+    """
+    Runs function over the payloads in a process pool and returns the
+    results in the same order. With one worker, or only one payload, the
+    work is done in this process.
+    """
+    if workers <= 1 or len(payloads) <= 1:
+        return map(function, payloads)
+    workers = min(workers, len(payloads))
+    if ProcessPoolExecutor is not None:
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(function, payloads))
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(function, payloads, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+def _run(function, data, extra, workers, chunk_size):
+    """
+    Splits the input into parts of chunk_size items and runs function over
+    them, returning the results in order. Each part is given to function as
+    a (source, start, stop) payload, see _part(). The parts depend only on
+    the input, never on the number of workers.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    size = _length(data)
+    ranges = [(start, min(start + chunk_size, size)) for start in xrange(0, size, chunk_size)]
+    if _FORK or workers <= 1 or len(ranges) <= 1:
+        token = next(_TOKENS)
+        _INPUTS[token] = (data, extra)
+        try:
+            return _map(function, [(token, start, stop) for start, stop in ranges], workers)
+        finally:
+            del _INPUTS[token]
+    payloads = [((_slice(data, start, stop), extra), 0, stop - start) for start, stop in ranges]
+    return _map(function, payloads, workers)
+
+#
+# The work done in the worker processes
+#
+
+def _part(payload):
+    """
+    Returns the items of a part of the input, as (currency, exponent, units)
+    triples, and the extra arguments of the call.
+    """
+    source, start, stop = payload
+    if not isinstance(source, tuple):
+        source = _INPUTS[source]
+    data, extra = source
+    return _items(data, start, stop), extra
+
+def _items(data, start, stop):
+    if isinstance(data, Ledger):
+        currencies = {}
+        for codes, amounts in data[start:stop]._chunks(CURRENCIES, AMOUNTS):
+            for code, units in zip(codes, amounts):
+                currency = currencies.get(code)
+                if currency is None:
+                    currency = currencies[code] = CURRENCY.by_numeric(code)
+                yield currency, -currency.decimals, units
+    elif isinstance(data, _BUFFERS):
+        unpack_from = RECORD.unpack_from
+        size = RECORD.size
+        currencies = {}
+        for offset in xrange(start * size, stop * size, size):
+            numeric, scale, units = unpack_from(data, offset)
+            currency = currencies.get(numeric)
+            if currency is None:
+                currency = currencies[numeric] = CURRENCY.by_numeric(numeric)
+            if scale < currency.decimals:
+                units *= 10 ** (currency.decimals - scale)
+                scale = currency.decimals
+            yield currency, -scale, units
+    else:
+        for money in data[start:stop]:
+            currency = money.currency
+            units, exponent = _units(money.amount, currency.decimals)
+            yield currency, exponent, units
+
+def _sum_part(payload):
+    items, extra = _part(payload)
+    totals = {}
+    for currency, exponent, units in items:
+        key = (currency, exponent)
+        totals[key] = totals.get(key, 0) + units
+    return totals
+
+def _convert_part(payload):
+    items, (currency, rates, at) = _part(payload)
+    factors = {}
+    converted = array(TYPECODE)
+    append = converted.append
+    for source, exponent, units in items:
+        key = (source, exponent)
+        factor = factors.get(key)
+        if factor is None:
+            # units * 10 ** exponent * rate, in minor units of the target
+            numerator, denominator = _fraction(get_exchange_rate(source, currency, rates, at))
+            numerator *= 10 ** currency.decimals
+            if exponent < 0:
+                denominator *= 10 ** -exponent
+            else:
+                numerator *= 10 ** exponent
+            factor = factors[key] = (numerator, denominator)
+        numerator, denominator = factor
+        if denominator == 1:
+            append(units * numerator)
+        else:
+            append(_round_div(units * numerator, denominator))
+    return converted.tostring()
+
+def _allocate_part(payload):
+    items, (weights, total) = _part(payload)
+    size = RECORD.size
+    pack_into = RECORD.pack_into
+    parts = [bytearray(size * (payload[2] - payload[1])) for weight in weights]
+    numerics = {}
+    offset = 0
+    for currency, exponent, units in items:
+        numeric = numerics.get(currency)
+        if numeric is None:
+            numeric = numerics[currency] = _numeric(currency)
+        for part, share in zip(parts, _split_units(units, weights, total)):
+            pack_into(part, offset, numeric, -exponent, share)
+        offset += size
+    return [str(part) for part in parts]
+
+#
+# The public functions
+#
+
+def _totals(data, workers, chunk_size):
+    """
+    Returns {currency: (units, exponent)} with the exact total of every
+    currency.
+    """
+    totals = {}
+    for part in _run(_sum_part, _prepare(data), None, workers, chunk_size):
+        for (currency, exponent), total in part.items():
+            if currency in totals:
+                other, other_exponent = totals[currency]
+                if other_exponent < exponent:
+                    total *= 10 ** (exponent - other_exponent)
+                    exponent = other_exponent
+                else:
+                    other *= 10 ** (other_exponent - exponent)
+                total += other
+            totals[currency] = (total, exponent)
+    return totals
+
+def parallel_sum(data, currency=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Adds up amounts in one currency using a pool of worker processes (by
+    default one per CPU). The amounts can be a sequence of Money, a buffer
+    of money.wire records or a money.ledger.Ledger. Each worker converts its
+    part of them to integers and adds them up, so this process only combines
+    one total per part. The result is exact and the same as Money.sum() for
+    any number of workers. Raises TypeError for mixed currencies.
+    """
+    totals = _totals(data, workers, chunk_size)
+    if len(totals) > 1:
+        raise TypeError('can not add different currencies')
+    if not totals:
+        currency = currency and _currency(currency) or get_default_currency()
+        return _make(_from_units(0, -currency.decimals), currency)
+    found, (total, exponent) = totals.items()[0]
+    if currency is not None and found is not _currency(currency):
+        raise TypeError('can not add different currencies')
+    return _make(_from_units(total, exponent), found)
+
+def parallel_totals(data, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Adds up amounts in any currencies in parallel, like parallel_sum(), and
+    returns a MoneyBag with the total of each currency.
+    """
+    bag = MoneyBag()
+    for currency, (total, exponent) in _totals(data, workers, chunk_size).items():
+        bag.add(_make(_from_units(total, exponent), currency))
+    return bag
+
+def parallel_convert(data, currency, rates=None, at=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Converts amounts into one currency in parallel and returns a MoneyArray
+    with the results in the original order. The amounts can be given like
+    for parallel_sum(). The workers convert their parts with the given rate
+    source, or the one installed when the call starts, and send back the
+    results as arrays of integers. Like MoneyArray.convert(), results are
+    rounded half to even to the minor unit of the target currency.
+    """
+    currency = _currency(currency)
+    if rates is None:
+        rates = _current_rates()
+    units = array(TYPECODE)
+    for part in _run(_convert_part, _prepare(data), (currency, rates, at), workers, chunk_size):
+        units.fromstring(part)
+    return MoneyArray._wrap(units, currency)
+
+def parallel_allocate(data, ratios, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Allocates amounts, given like for parallel_sum(), by the same ratios in
+    parallel. Every amount is split like allocate_many() does. Returns one
+    buffer of money.wire records per ratio, so that record j of buffer i is
+    part i of amount j; decode them with money.wire.unpack_many() or
+    unpack_array().
+    """
+    weights, total = _allocation_weights(ratios)
+    results = _run(_allocate_part, _prepare(data), (weights, total), workers, chunk_size)
+    return [''.join(part[i] for part in results) for i in range(len(weights))]
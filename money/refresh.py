@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from Money import set_rate_source
+from exchange import RateSnapshot
+
+__all__ = ('RateRefresher', 'FileRateProvider')
+
+
+class FileRateProvider(object):
+    """
+    Reads exchange rates from a text file with one "SOURCE TARGET RATE" line
+    per rate. Blank lines and lines starting with '#' are skipped.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self):
+        rates = []
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    source, target, rate = line.split()
+                    rates.append((source, target, rate))
+        return rates
+
+
+class RateRefresher(object):
+    """
+    Keeps exchange rates up to date in the background.
+
+    A provider is any callable that returns rates in a form RateTable
+    accepts: (source, target, rate) triples or a {(source, target): rate}
+    dict. Providers are tried in order, each with a timeout, until one
+    succeeds. Its rates are built into a new RateSnapshot, which is then
+    published by assigning a single reference: self.snapshot, and the
+    installed rate source unless install is False. on_refresh, if given, is
+    called with every new snapshot, e.g. to publish it to SharedRates. If
+    every provider fails the previous snapshot stays in place, and the error
+    is kept in last_error, as is an error raised by on_refresh. Neither
+    stops the background thread. last_error only holds errors from the most
+    recent refresh, and is None after one without any.
+
+    Readers never lock. Money.convert_to() uses whichever snapshot is
+    installed at the moment, and the batch conversions (convert_many(),
+    MoneyBag.convert_to(), parallel_convert(), money_aggregate()) take the
+    installed one once per call, so a refresh never mixes two snapshots in
+    one result.
+
+    Python 2 has no asyncio, so the polling runs in a daemon thread, and
+    every provider call runs in a thread of its own so that it can be
+    abandoned when it takes longer than the timeout.
+    """
+    def __init__(self, providers, interval=300, timeout=30, base=None, install=True, on_refresh=None):
+        if callable(providers):
+            providers = [providers]
+        self.providers = list(providers)
+        self.interval = interval
+        self.timeout = timeout
+        self.base = base
+        self.install = install
+        self.on_refresh = on_refresh
+        self.snapshot = None
+        self.refreshed = None
+        self.last_error = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _fetch(self, provider):
+        result = {}
+        def call():
+            try:
+                result['rates'] = provider()
+            except Exception as e:
+                result['error'] = e
+        worker = threading.Thread(target=call, name='money rate provider')
+        worker.daemon = True
+        worker.start()
+        worker.join(self.timeout)
+        if worker.is_alive():
+            raise RuntimeError('%r timed out after %s seconds' % (provider, self.timeout))
+        if 'error' in result:
+            raise result['error']
+        return result['rates']
+
+    def refresh(self):
+        """
+        Fetches new rates and publishes them. Returns the new snapshot, or
+        None if no provider succeeded.
+        """
+        # Set once at the end, so that readers see the error of the previous
+        # refresh until this one is done
+        error = None
+        for provider in self.providers:
+            try:
+                snapshot = RateSnapshot(self._fetch(provider), self.base)
+            except Exception as e:
+                error = e
+                continue
+            self.snapshot = snapshot
+            if self.install:
+                set_rate_source(snapshot)
+            if self.on_refresh is not None:
+                try:
+                    self.on_refresh(snapshot)
+                except Exception as e:
+                    error = e
+            self.refreshed = time.time()
+            self.last_error = error
+            return snapshot
+        self.last_error = error
+        return None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = e
+            self._stopping.wait(self.interval)
+
+    def start(self):
+        """
+        Refreshes the rates now and then every interval seconds in a
+        background thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='money rate refresher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import mmap
+import os
+import struct
+import time
+from decimal import Decimal, Context
+from Money import CURRENCY
+from exchange import ExchangeRateNotFound, ONE, _currency, _positive
+
+__all__ = ('SharedRates',)
+
+# The file starts with a header: MAGIC, the sequence number of the seqlock,
+# the numeric code of the base currency, the number of rates and the number
+# of rates there is room for. Each rate is the value of one unit of a
+# currency in the base currency, stored exactly as an integer coefficient
+# and a decimal exponent. Everything is little endian.
+MAGIC = 'MRATES01'
+HEADER = struct.Struct('<8sQHHH2x')
+ENTRY = struct.Struct('<Hxxiq')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 8
+
+# How often a reader retries while the rates are being written
+SPINS = 100000
+
+# Rates are rounded to the digits that fit in the 64 bit coefficient
+_ROUNDING = Context(prec=18)
+
+
+class SharedRates(object):
+    """
+    Exchange rates in a memory-mapped file that every process on the machine
+    can map, e.g. under /dev/shm, so that all the workers of a web server
+    read the same rates without any IPC per lookup. One process publishes
+    new rates with publish().
+
+    The rates are guarded by a seqlock: the writer makes the sequence
+    number odd while it writes and even again when it is done, and a reader
+    retries until it sees the same even number before and after copying the
+    rates. Readers decode the rates only when the sequence number changes,
+    so most lookups are one read of the header and a dict lookup.
+
+    Install it with money.set_rate_source() to use it for Money.convert_to()
+    and convert_to_default().
+    """
+    def __init__(self, path, writable=False):
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError('%s is not a shared rate table' % path)
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._map = mmap.mmap(f.fileno(), 0, access=access)
+        magic, sequence, base, count, capacity = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a shared rate table' % path)
+        self.base = CURRENCY.by_numeric(base)
+        self.capacity = capacity
+        self._state = (None, {}, {})
+
+    @classmethod
+    def create(cls, path, base, capacity=256):
+        """
+        Creates a rate table file with room for capacity currencies, without
+        any rates yet, and opens it for writing.
+
+        An existing table is opened as it is, with its rates and sequence
+        number, since readers may have it mapped; it is never truncated.
+        ValueError is raised if it has a different base currency or
+        capacity.
+        """
+        base = _currency(base)
+        with open(path, 'ab') as f:
+            if not os.fstat(f.fileno()).st_size:
+                f.write(HEADER.pack(MAGIC, 0, int(base.numeric), 0, capacity))
+                f.write('\0' * (ENTRY.size * capacity))
+        table = cls(path, writable=True)
+        if table.base is not base or table.capacity != capacity:
+            table.close()
+            raise ValueError('%s is a rate table for %s with room for %d currencies'
+                             % (path, table.base, table.capacity))
+        return table
+
+    def close(self):
+        self._map.close()
+
+    #
+    # Writing
+    #
+
+    def publish(self, rates):
+        """
+        Replaces all of the rates. They can be given as a dict of {currency:
+        value of one unit in the base currency} or as any rate source with
+        rate() and currencies(), like a RateTable or a RateSnapshot.
+        """
+        base = self.base
+        if hasattr(rates, 'rate'):
+            values = {}
+            for currency in rates.currencies():
+                try:
+                    values[currency] = rates.rate(currency, base)
+                except ExchangeRateNotFound:
+                    pass
+        else:
+            values = dict((_currency(currency), _positive(value)) for currency, value in rates.items())
+        values[base] = ONE
+        if len(values) > self.capacity:
+            raise ValueError('%d rates do not fit in a table for %d' % (len(values), self.capacity))
+
+        entries = []
+        for currency, value in values.items():
+            sign, digits, exponent = _ROUNDING.plus(value).as_tuple()
+            entries.append(ENTRY.pack(int(currency.numeric), exponent, int(''.join(map(str, digits)))))
+        data = ''.join(entries)
+
+        mapping = self._map
+        # The next odd number, even if an earlier writer stopped half way
+        # and left the sequence number odd
+        sequence = (SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0] + 1) | 1
+        SEQUENCE.pack_into(mapping, SEQUENCE_OFFSET, sequence)
+        HEADER.pack_into(mapping, 0, MAGIC, sequence, int(base.numeric), len(entries), self.capacity)
+        mapping[HEADER.size:HEADER.size + len(data)] = data
+        SEQUENCE.pack_into(mapping, SEQUENCE_OFFSET, sequence + 1)
+
+    #
+    # Reading
+    #
+
+    def _load(self):
+        mapping = self._map
+        for attempt in xrange(SPINS):
+            sequence = SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0]
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            count = HEADER.unpack_from(mapping)[3]
+            data = mapping[HEADER.size:HEADER.size + count * ENTRY.size]
+            if SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0] == sequence:
+                break
+        else:
+            raise RuntimeError('%s is still being written' % self.path)
+        values = {}
+        for offset in xrange(0, len(data), ENTRY.size):
+            numeric, exponent, coefficient = ENTRY.unpack_from(data, offset)
+            values[CURRENCY.by_numeric(numeric)] = Decimal(coefficient).scaleb(exponent)
+        # The decoded rates and the cache of cross rates are replaced together
+        state = self._state = (sequence, values, {})
+        return state
+
+    def _current(self):
+        state = self._state
+        if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] != state[0]:
+            state = self._load()
+        return state
+
+    def rate(self, source, target):
+        """
+        Returns the current rate for converting from source to target. Raises
+        ExchangeRateNotFound if either currency has no rate.
+        """
+        sequence, values, rates = self._current()
+        key = (source, target)
+        try:
+            return rates[key]
+        except KeyError:
+            pass
+        source, target = _currency(source), _currency(target)
+        if source is target:
+            return ONE
+        if source not in values or target not in values:
+            raise ExchangeRateNotFound(source, target)
+        rate = rates[key] = values[source] / values[target]
+        return rate
+
+    def currencies(self):
+        return self._current()[1].keys()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from Money import _fixed
+
+__all__ = ('UNIT_NAMES', 'number_to_words', 'spell_out', 'spell_out_many')
+
+# The singular and plural names of the major and minor unit of a currency.
+# Currencies that are not listed use their name for the major unit and write
+# the minor units as a fraction, like on a cheque: "and 17/100".
+UNIT_NAMES = {
+    'AUD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'BRL': (u'real', u'reais', u'centavo', u'centavos'),
+    'CAD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'CHF': (u'franc', u'francs', u'centime', u'centimes'),
+    'CNY': (u'yuan', u'yuan', u'fen', u'fen'),
+    'CZK': (u'koruna', u'korunas', u'haler', u'halers'),
+    'DKK': (u'krone', u'kroner', u'øre', u'øre'),
+    'EUR': (u'euro', u'euros', u'cent', u'cents'),
+    'GBP': (u'pound', u'pounds', u'penny', u'pence'),
+    'HKD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'INR': (u'rupee', u'rupees', u'paisa', u'paise'),
+    'JPY': (u'yen', u'yen', None, None),
+    'KWD': (u'dinar', u'dinars', u'fils', u'fils'),
+    'NOK': (u'krone', u'kroner', u'øre', u'øre'),
+    'NZD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'PLN': (u'zloty', u'zlotys', u'grosz', u'groszy'),
+    'RUB': (u'rouble', u'roubles', u'kopek', u'kopeks'),
+    'SEK': (u'krona', u'kronor', u'öre', u'öre'),
+    'SGD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'USD': (u'dollar', u'dollars', u'cent', u'cents'),
+    'ZAR': (u'rand', u'rand', u'cent', u'cents'),
+}
+
+_ONES = (u'zero', u'one', u'two', u'three', u'four', u'five', u'six', u'seven',
+         u'eight', u'nine', u'ten', u'eleven', u'twelve', u'thirteen',
+         u'fourteen', u'fifteen', u'sixteen', u'seventeen', u'eighteen',
+         u'nineteen')
+_TENS = (u'', u'', u'twenty', u'thirty', u'forty', u'fifty', u'sixty',
+         u'seventy', u'eighty', u'ninety')
+_SCALES = (u'', u' thousand', u' million', u' billion', u' trillion',
+           u' quadrillion', u' quintillion', u' sextillion', u' septillion',
+           u' octillion', u' nonillion', u' decillion')
+
+def _below_thousand(number):
+    hundreds, rest = divmod(number, 100)
+    if rest < 20:
+        words = _ONES[rest]
+    else:
+        tens, ones = divmod(rest, 10)
+        words = _TENS[tens] + (u'-' + _ONES[ones] if ones else u'')
+    if not hundreds:
+        return words
+    if not rest:
+        return _ONES[hundreds] + u' hundred'
+    return _ONES[hundreds] + u' hundred and ' + words
+
+# Every number from 0 to 999 in words, built once
+_WORDS = tuple(_below_thousand(number) for number in range(1000))
+
+def number_to_words(number):
+    """
+    Spells out a whole number in British English, e.g. 1005 is "one thousand
+    and five". Raises ValueError for numbers of a thousand decillion and up.
+    """
+    if number < 0:
+        return u'minus ' + number_to_words(-number)
+    if number < 1000:
+        return _WORDS[number]
+    lowest = number % 1000
+    groups = []
+    scale = 0
+    while number:
+        number, group = divmod(number, 1000)
+        if group:
+            if scale >= len(_SCALES):
+                raise ValueError('number is too large to spell out')
+            groups.append(_WORDS[group] + _SCALES[scale])
+        scale += 1
+    if lowest < 100 and lowest:
+        groups[0] = u'and ' + groups[0]
+    groups.reverse()
+    return u' '.join(groups)
+
+def _spell(currency, negative, whole, fraction):
+    names = UNIT_NAMES.get(currency.code)
+    if names is None:
+        names = (currency.name, currency.name, None, None)
+    major, majors, minor, minors = names
+    words = number_to_words(whole) + u' ' + (major if whole == 1 else majors)
+    units = int(fraction or 0)
+    if units:
+        if minor:
+            words += u' and ' + number_to_words(units) + u' ' + (minor if units == 1 else minors)
+        else:
+            words += u' and %s/%d' % (fraction, 10 ** len(fraction))
+    if negative:
+        words = u'minus ' + words
+    return words[0].upper() + words[1:]
+
+def spell_out(money):
+    """
+    Spells out a Money, e.g. "Two hundred and twenty-six dollars and
+    seventeen cents". The amount is rounded half to even to the currency's
+    decimal places first.
+    """
+    currency = money.currency
+    negative, whole, fraction = _fixed(money.amount, currency.decimals)
+    return _spell(currency, negative, whole, fraction)
+
+def spell_out_many(moneys):
+    """
+    Spells out an iterable of Money and returns a list of strings. Amounts
+    that occur more than once in the batch are only spelled out once.
+    """
+    spelled = {}
+    results = []
+    append = results.append
+    for money in moneys:
+        key = (money.currency, money.amount)
+        words = spelled.get(key)
+        if words is None:
+            words = spelled[key] = spell_out(money)
+        append(words)
+    return results
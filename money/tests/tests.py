@@ -1,8 +1,29 @@
+import cPickle
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from django.db.models import Avg, Count, F, Max, Min, Sum
 from django.test import TestCase
 
 from money.tests.models import TestMoneyModel, TestMoneyModel_0_USD, TestMoneyModel_USD
 from money.contrib.django.models.fields import NotSupportedLookup
-from money import Money, CURRENCY
+from money import Money, MoneyArray, MoneyBag, Currency, msum, allocate_many, CurrencyRegistry, CURRENCY, CURRENCY_DATA
+from money import RateTable, HistoricalRates, ExchangeRateNotFound, set_rate_source
+from money import default_currency, get_default_currency, set_default_currency
+from money import convert_many, iconvert_many
+from money import parse_many, IncorrectMoneyInputError, RateSnapshot
+from money.formatting import format_money, format_many, get_formatter
+from money.spelling import number_to_words, spell_out_many
+from money.wire import pack, pack_many, unpack, unpack_many, unpack_array
+from money.ledger import Ledger, LedgerWriter
+from money.refresh import RateRefresher, FileRateProvider
+from money.sharedrates import SharedRates
+from money.parallel import parallel_sum, parallel_totals, parallel_convert, parallel_allocate
 
 
 class MoneyTestCase(TestCase):
@@ -29,6 +50,795 @@ class MoneyTestCase(TestCase):
         # But not different currencies
         self.assertFalse(ten_bucks == juu_en)
 
+    def testOperandConversion(self):
+        # ints are converted exactly
+        big = 10 ** 20 + 1
+        self.assertEqual(Money(big, 'USD').amount, Decimal(big))
+        self.assertEqual((Money(1, 'USD') * big).amount, Decimal(big))
+
+        # floats are converted from their shortest repr
+        self.assertEqual(Money(0.1, 'USD').amount, Decimal('0.1'))
+        self.assertEqual(Money(1, 'USD') + 0.1, Money('1.1', 'USD'))
+        self.assertTrue(Money('0.3', 'USD') > 0.1 + 0.1)
+
+        # Decimals are used as they are
+        amount = Decimal('12.345')
+        self.assertTrue(Money(amount, 'USD').amount is amount)
+        self.assertEqual(Money(1, 'USD') - Decimal('0.5'), Money('0.5', 'USD'))
+
+    def testSum(self):
+        self.assertEqual(Money.sum(Money(i, 'USD') for i in range(101)), Money(5050, 'USD'))
+        self.assertEqual(msum([Money('1.5', 'USD'), Money('-3.25', 'USD'), Money(1, 'USD')]), Money('-0.75', 'USD'))
+        self.assertEqual(msum([], 'EUR'), Money(0, 'EUR'))
+
+        # The total is exact even beyond the decimal context's precision
+        total = msum([Money(Decimal('1E+40'), 'USD'), Money('0.01', 'USD')])
+        self.assertEqual(total.amount, Decimal('10000000000000000000000000000000000000000.01'))
+
+        self.assertRaises(TypeError, msum, [Money(1, 'USD'), Money(1, 'EUR')])
+        self.assertRaises(TypeError, msum, [Money(1, 'USD')], 'EUR')
+
+        # Infinite and NaN amounts can not be added up as integers
+        for amount in ('Infinity', '-Infinity', 'NaN'):
+            self.assertRaises(ValueError, msum, [Money(1, 'USD'), Money(amount, 'USD'), Money('0.5', 'USD')])
+
+    def testAllocate(self):
+        self.assertEqual(Money(100, 'USD').allocate((1, 1, 1)),
+                         [Money('33.34', 'USD'), Money('33.33', 'USD'), Money('33.33', 'USD')])
+        self.assertEqual(Money(100, 'JPY').allocate((1, 1, 1)),
+                         [Money(34, 'JPY'), Money(33, 'JPY'), Money(33, 'JPY')])
+        self.assertEqual(Money(1, 'KWD').allocate((1, 1, 1)),
+                         [Money('0.334', 'KWD'), Money('0.333', 'KWD'), Money('0.333', 'KWD')])
+
+        # Left over units go to the largest remainders
+        self.assertEqual(Money('0.10', 'USD').allocate((Decimal('0.14'), Decimal('0.43'), Decimal('0.43'))),
+                         [Money('0.02', 'USD'), Money('0.04', 'USD'), Money('0.04', 'USD')])
+        self.assertEqual(Money(-10, 'USD').allocate((1, 2)), [Money('-3.33', 'USD'), Money('-6.67', 'USD')])
+
+        # The parts always add up to the original amount
+        parts = Money('1000000000.07', 'USD').allocate(range(1, 21))
+        self.assertEqual(msum(parts), Money('1000000000.07', 'USD'))
+
+        self.assertRaises(ValueError, Money(1, 'USD').allocate, (0, 0))
+        self.assertRaises(ValueError, Money(1, 'USD').allocate, (1, -1))
+
+    def testAllocateMany(self):
+        self.assertEqual(allocate_many([Money(10, 'USD'), Money(1, 'JPY')], (50, 50)),
+                         [[Money(5, 'USD'), Money(5, 'USD')], [Money(1, 'JPY'), Money(0, 'JPY')]])
+
+    def testImmutable(self):
+        ten_bucks = Money(10, 'USD')
+        self.assertRaises(AttributeError, setattr, ten_bucks, 'amount', 20)
+        self.assertRaises(AttributeError, setattr, ten_bucks, 'currency', CURRENCY['EUR'])
+        self.assertRaises(AttributeError, setattr, ten_bucks, 'other', 1)
+        self.assertEqual(ten_bucks, Money(10, 'USD'))
+
+    def testHashing(self):
+        prices = set([Money(10, 'USD'), Money('10.00', 'USD'), Money(10, 'JPY')])
+        self.assertEqual(len(prices), 2)
+
+        totals = {Money(10, 'USD'): 'ten'}
+        self.assertEqual(totals[Money('10.0', 'USD')], 'ten')
+
+        # Zero amounts are equal to 0 and therefore hash the same way
+        self.assertEqual(hash(Money(0, 'USD')), hash(0))
+
+    def testPickle(self):
+        usd = Money('1.50', 'USD')
+        for module in (pickle, cPickle):
+            for protocol in (0, 2):
+                copy = module.loads(module.dumps(usd, protocol))
+                self.assertEqual(copy, usd)
+                self.assertTrue(copy.currency is CURRENCY['USD'])
+                self.assertTrue(module.loads(module.dumps(CURRENCY['EUR'], protocol)) is CURRENCY['EUR'])
+        # Only the code and the amount are stored
+        self.assertTrue(len(cPickle.dumps(usd, 2)) < 64)
+        # Currencies outside the registry are pickled in full
+        zed = Currency('ZZZ', '998', 'Zed', decimals=3)
+        copy = pickle.loads(pickle.dumps(Money('1.234', zed), 2))
+        self.assertEqual((copy.amount, copy.currency.code, copy.currency.decimals), (Decimal('1.234'), 'ZZZ', 3))
+
+    def testParse(self):
+        self.assertEqual(Money.parse('USD 1,234.56'), Money('1234.56', 'USD'))
+        self.assertEqual(Money.parse(' -12.5 eur\n'), Money('-12.5', 'EUR'))
+        self.assertEqual(Money.parse(u'\u00a3-3'), Money(-3, 'GBP'))
+        self.assertEqual(Money.parse('+7'), Money(7, 'XXX'))
+        self.assertEqual(Money.parse('.5', currency='JPY'), Money('0.5', 'JPY'))
+        self.assertEqual(Money.parse('$5', currency='CAD'), Money(5, 'CAD'))
+        self.assertEqual(Money.parse('1.234,5 EUR', decimal_point=',', thousands='.'),
+                         Money('1234.5', 'EUR'))
+        self.assertEqual(Money.from_string('USD10'), Money(10, 'USD'))
+        for bad in ('', 'USD', '1,23', '--1', 'USD 5 EUR', 'XYZ 5', '$5'):
+            self.assertRaises(IncorrectMoneyInputError, Money.parse, bad)
+        self.assertRaises(IncorrectMoneyInputError, Money.parse, '10', currency='ZZZ')
+
+    def testParseMany(self):
+        results = list(parse_many(['1.50 USD', 'garbage', '2']))
+        self.assertEqual(results[0], (Money('1.5', 'USD'), None))
+        self.assertEqual(results[1][0], None)
+        self.assertTrue('garbage' in results[1][1])
+        self.assertEqual(results[2], (Money(2, 'XXX'), None))
+        money, error = list(parse_many(['10'], currency='ZZZ'))[0]
+        self.assertEqual(money, None)
+        self.assertTrue('ZZZ' in error)
+
+
+class FormattingTestCase(TestCase):
+
+    def testFormatMoney(self):
+        self.assertEqual(format_money(Money('1234.5', 'USD')), u'$1,234.50')
+        self.assertEqual(format_money(Money('-1234567.5', 'EUR'), 'de_DE'), u'-1.234.567,50 \u20ac')
+        self.assertEqual(format_money(Money(2000, 'JPY'), style='code'), u'JPY 2,000')
+        self.assertEqual(format_money(Money(3, 'KWD')), u'KWD 3.000')
+        self.assertEqual(format_money(Money('0.125', 'USD'), style='plain'), u'0.12')
+        # Digits beyond the range of a float are kept
+        self.assertEqual(format_money(Money('12345678901234567890.01', 'USD'), style='plain'),
+                         u'12,345,678,901,234,567,890.01')
+        self.assertRaises(ValueError, format_money, Money(1, 'USD'), 'xx_XX')
+
+    def testFormatMany(self):
+        self.assertEqual(format_many([Money(1, 'USD'), Money(2, 'GBP')], style='code'),
+                         [u'USD 1.00', u'GBP 2.00'])
+        formatter = get_formatter('USD')
+        self.assertTrue(get_formatter(CURRENCY['USD']) is formatter)
+        self.assertRaises(TypeError, formatter, Money(1, 'EUR'))
+
+    def testRepr(self):
+        self.assertEqual(repr(Money('12345678901234567.89', 'USD')), 'USD 12345678901234567.89')
+        self.assertEqual(repr(Money('0.5', 'USD')), 'USD  0.50')
+
+
+class SpellingTestCase(TestCase):
+
+    def testNumberToWords(self):
+        self.assertEqual(number_to_words(0), u'zero')
+        self.assertEqual(number_to_words(115), u'one hundred and fifteen')
+        self.assertEqual(number_to_words(1005), u'one thousand and five')
+        self.assertEqual(number_to_words(2000042), u'two million and forty-two')
+        self.assertEqual(number_to_words(-21), u'minus twenty-one')
+
+    def testSpellOut(self):
+        self.assertEqual(Money('226.17', 'USD').spell_out(),
+                         u'Two hundred and twenty-six dollars and seventeen cents')
+        self.assertEqual(Money('0.01', 'GBP').spell_out(), u'Zero pounds and one penny')
+        self.assertEqual(Money(1, 'USD').spell_out(), u'One dollar')
+        self.assertEqual(Money('-1.5', 'KWD').spell_out(), u'Minus one dinar and five hundred fils')
+        self.assertEqual(Money(2000, 'JPY').spell_out(), u'Two thousand yen')
+        self.assertEqual(Money('12.34', 'PKR').spell_out(), u'Twelve Pakistan Rupee and 34/100')
+
+    def testSpellOutMany(self):
+        self.assertEqual(spell_out_many([Money(1, 'USD'), Money(2, 'EUR'), Money('1.00', 'USD')]),
+                         [u'One dollar', u'Two euros', u'One dollar'])
+
+
+class WireFormatTestCase(TestCase):
+
+    def testRoundTrip(self):
+        moneys = [Money('1.5', 'USD'), Money(-3, 'JPY'), Money('0.125', 'USD'), Money('2.345', 'KWD')]
+        data = pack_many(moneys)
+        self.assertEqual(len(data), 4 * 11)
+        decoded = list(unpack_many(memoryview(data)))
+        self.assertEqual(decoded, moneys)
+        self.assertEqual([money.currency for money in decoded], [money.currency for money in moneys])
+        self.assertEqual(unpack(data, 2).amount, Decimal('0.125'))
+        self.assertEqual(unpack(pack(Money(7, 'EUR'))), Money(7, 'EUR'))
+        self.assertRaises(ValueError, pack_many, [Money(10 ** 20, 'USD')])
+        self.assertRaises(ValueError, list, unpack_many(data[:-1]))
+
+    def testUnregisteredCurrency(self):
+        # Currencies whose numeric code would decode as another one, or that
+        # have none, can not be encoded
+        self.assertRaises(ValueError, pack, Money(1, Currency('ZZZ')))
+        self.assertRaises(ValueError, pack, Money(1, Currency('ZZZ', numeric='840')))
+        self.assertRaises(ValueError, pack, Money(1, Currency('ZZZ', numeric='Nil')))
+        self.assertRaises(ValueError, pack, Money(1, 'XFO'))
+
+    def testUnpackArray(self):
+        data = pack_many([Money(1, 'USD'), Money('2.5', 'USD')])
+        self.assertEqual(unpack_array(data), MoneyArray([100, 250], 'USD'))
+        self.assertRaises(TypeError, unpack_array, data, 'EUR')
+        self.assertRaises(ValueError, unpack_array, pack_many([Money('0.125', 'USD')]))
+
+
+class LedgerTestCase(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(self.path)
+        # Small blocks, so that most operations span several of them
+        with LedgerWriter(self.path, block_size=3) as writer:
+            for i in range(10):
+                writer.append(1000 + i, i % 2, Money(i, 'USD' if i % 3 else 'EUR'))
+        with LedgerWriter(self.path) as writer:
+            writer.append(2000, 5, Money(7, 'JPY'))
+        self.ledger = Ledger(self.path)
+
+    def tearDown(self):
+        self.ledger.close()
+        os.remove(self.path)
+
+    def testTotals(self):
+        ledger = self.ledger
+        self.assertEqual(len(ledger), 11)
+        self.assertEqual(ledger.currencies(), [CURRENCY['EUR'], CURRENCY['JPY'], CURRENCY['USD']])
+        self.assertEqual(ledger.sum('USD'), Money(27, 'USD'))
+        self.assertEqual(ledger.sum('GBP'), Money(0, 'GBP'))
+        self.assertEqual(ledger.totals(), MoneyBag(Money(18, 'EUR'), Money(7, 'JPY'), Money(27, 'USD')))
+        self.assertEqual(ledger.amounts('EUR'), MoneyArray.from_amounts([0, 3, 6, 9], 'EUR'))
+
+    def testTruncatedBlock(self):
+        # A block cut short by a crash is dropped before appending again
+        with open(self.path, 'ab') as f:
+            f.write('BLCK\x05\x00\x00\x00' + '\x01' * 20)
+        with LedgerWriter(self.path) as writer:
+            writer.append(3000, 6, Money(1, 'USD'))
+        with Ledger(self.path) as ledger:
+            self.assertEqual(len(ledger), 12)
+            self.assertEqual(ledger.sum('USD'), Money(28, 'USD'))
+
+        # So is a block header cut short
+        size = os.path.getsize(self.path)
+        with open(self.path, 'ab') as f:
+            f.write('BLC')
+        LedgerWriter(self.path).close()
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def testEmptyFile(self):
+        open(self.path, 'wb').close()
+        self.assertRaises(ValueError, Ledger, self.path)
+
+    def testUnregisteredCurrency(self):
+        with LedgerWriter(self.path) as writer:
+            self.assertRaises(ValueError, writer.append, 0, 0, Money(1, Currency('ZZZ')))
+
+    def testSlicing(self):
+        part = self.ledger[2:7]
+        self.assertEqual(len(part), 5)
+        self.assertEqual(list(part.timestamps()), [1002, 1003, 1004, 1005, 1006])
+        self.assertEqual(part.totals(), MoneyBag(Money(9, 'EUR'), Money(11, 'USD')))
+        self.assertEqual(list(part[2:4]), [(1004, 0, Money(4, 'USD')), (1005, 1, Money(5, 'USD'))])
+        self.assertEqual(self.ledger[-1], (2000, 5, Money(7, 'JPY')))
+        self.assertEqual(list(self.ledger.rows('JPY')), [(2000, 5, Money(7, 'JPY'))])
+
+
+class ParallelTestCase(TestCase):
+
+    def setUp(self):
+        self.moneys = [Money(Decimal(i) / 100, 'USD' if i % 3 else 'EUR') for i in range(1000)]
+        self.moneys.append(Money('0.001', 'USD'))
+
+    def testSum(self):
+        usd = [money for money in self.moneys if money.currency is CURRENCY['USD']]
+        for workers in (1, 2, 3):
+            self.assertEqual(parallel_sum(usd, workers=workers, chunk_size=100), Money.sum(usd))
+            self.assertEqual(parallel_totals(self.moneys, workers=workers, chunk_size=100), MoneyBag(*self.moneys))
+        self.assertEqual(parallel_sum([], 'JPY'), Money(0, 'JPY'))
+        self.assertRaises(TypeError, parallel_sum, self.moneys)
+
+    def testConvert(self):
+        rates = RateTable([('EUR', 'USD', '1.1')])
+        converted = parallel_convert(self.moneys, 'USD', rates, workers=2, chunk_size=100)
+        self.assertTrue(isinstance(converted, MoneyArray))
+        self.assertEqual(len(converted), len(self.moneys))
+        self.assertEqual(converted[3], Money('0.03', 'USD'))
+        self.assertEqual(converted[999], Money('10.99', 'USD'))
+        self.assertEqual(converted[1000], Money(0, 'USD'))
+        self.assertEqual(parallel_convert(self.moneys, 'USD', rates, workers=1), converted)
+
+        # The installed rate source is used, and taken once
+        set_rate_source(rates)
+        try:
+            self.assertEqual(parallel_convert(self.moneys, 'USD', workers=2, chunk_size=100), converted)
+        finally:
+            set_rate_source(None)
+
+    def testAllocate(self):
+        expected = allocate_many(self.moneys, (1, 2, 3))
+        parts = parallel_allocate(self.moneys, (1, 2, 3), workers=2, chunk_size=100)
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(zip(*[list(unpack_many(part)) for part in parts]), [tuple(shares) for shares in expected])
+
+    def testPackedInput(self):
+        # Wire buffers and ledgers are split into parts without decoding them
+        data = pack_many(self.moneys)
+        for workers in (1, 2):
+            self.assertEqual(parallel_totals(memoryview(data), workers=workers, chunk_size=100),
+                             MoneyBag(*self.moneys))
+        rates = RateTable([('EUR', 'USD', '1.1')])
+        self.assertEqual(parallel_convert(data, 'USD', rates, workers=2, chunk_size=100),
+                         parallel_convert(self.moneys, 'USD', rates))
+        self.assertEqual(parallel_allocate(data, (1, 1), workers=2, chunk_size=100),
+                         parallel_allocate(self.moneys, (1, 1)))
+
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(path)
+        try:
+            with LedgerWriter(path, block_size=128) as writer:
+                writer.extend((i, 0, money) for i, money in enumerate(self.moneys[:1000]))
+            with Ledger(path) as ledger:
+                self.assertEqual(parallel_totals(ledger, workers=2, chunk_size=100), MoneyBag(*self.moneys[:1000]))
+                self.assertEqual(parallel_sum(ledger[1:2], workers=2), Money('0.01', 'USD'))
+                self.assertEqual(pickle.loads(pickle.dumps(ledger[10:20])).totals(), ledger[10:20].totals())
+        finally:
+            os.remove(path)
+
+    def testWithoutFork(self):
+        # Without fork() the parts are pickled and sent to the workers
+        import money.parallel
+        fork, money.parallel._FORK = money.parallel._FORK, False
+        try:
+            self.assertEqual(parallel_totals(self.moneys, workers=2, chunk_size=300), MoneyBag(*self.moneys))
+            self.assertEqual(parallel_totals(pack_many(self.moneys), workers=2, chunk_size=300),
+                             MoneyBag(*self.moneys))
+        finally:
+            money.parallel._FORK = fork
+
+
+class DefaultCurrencyTestCase(TestCase):
+
+    def tearDown(self):
+        set_default_currency('XXX')
+
+    def testScope(self):
+        self.assertEqual(Money(10).currency, CURRENCY['XXX'])
+        with default_currency('EUR') as eur:
+            self.assertTrue(eur is CURRENCY['EUR'])
+            self.assertEqual(Money(10), Money(10, 'EUR'))
+            with default_currency(CURRENCY['GBP']):
+                self.assertEqual(get_default_currency(), CURRENCY['GBP'])
+                self.assertEqual(MoneyArray([1]).currency, CURRENCY['GBP'])
+            self.assertEqual((Money(1, 'USD') + Money(1, 'JPY')).currency, CURRENCY['EUR'])
+        self.assertEqual(get_default_currency(), CURRENCY['XXX'])
+
+        # The global default is the fallback outside of any scope
+        set_default_currency('USD')
+        self.assertEqual(Money(1).currency, CURRENCY['USD'])
+
+    def testDecorator(self):
+        @default_currency('JPY')
+        def price():
+            return Money(500)
+        self.assertEqual(price(), Money(500, 'JPY'))
+        self.assertEqual(price.__name__, 'price')
+        self.assertEqual(get_default_currency(), CURRENCY['XXX'])
+
+    def testThreads(self):
+        seen = []
+        with default_currency('EUR'):
+            thread = threading.Thread(target=lambda: seen.append(Money(1).currency))
+            thread.start()
+            thread.join()
+            self.assertEqual(Money(1).currency, CURRENCY['EUR'])
+        self.assertEqual(seen, [CURRENCY['XXX']])
+
+
+class CurrencyRegistryTestCase(TestCase):
+
+    def testLookupByCode(self):
+        usd = CURRENCY['USD']
+        self.assertTrue(CURRENCY['usd'] is usd)
+        self.assertTrue(CURRENCY['Usd'] is usd)
+        self.assertTrue(CURRENCY[u'USD'] is usd)
+        self.assertTrue('usd' in CURRENCY)
+        self.assertRaises(KeyError, lambda: CURRENCY['ZZZ'])
+        self.assertEqual(Money(1, 'usd').currency, usd)
+
+    def testSecondaryIndexes(self):
+        self.assertEqual(CURRENCY.by_numeric(840), CURRENCY['USD'])
+        self.assertEqual(CURRENCY.by_numeric('840'), CURRENCY['USD'])
+        self.assertEqual(CURRENCY.by_numeric('008'), CURRENCY['ALL'])
+        self.assertEqual(CURRENCY.by_numeric(8), CURRENCY['ALL'])
+        self.assertRaises(KeyError, CURRENCY.by_numeric, 1)
+
+        self.assertEqual(CURRENCY.by_country('JAPAN'), (CURRENCY['JPY'],))
+        self.assertEqual(set(CURRENCY.by_country('korea')), set([CURRENCY['KPW'], CURRENCY['KRW']]))
+        self.assertEqual(CURRENCY.by_country('ATLANTIS'), ())
+
+        self.assertTrue(CURRENCY['USD'] in CURRENCY.by_symbol(u"$"))
+        self.assertTrue(CURRENCY['CAD'] in CURRENCY.by_symbol(u"$"))
+
+    def testRegister(self):
+        registry = CurrencyRegistry()
+        old = registry.register(Currency(code='ABC', numeric='001', countries=['NOWHERE']))
+        new = registry.register(Currency(code='ABC', numeric='002', countries=['NOWHERE']))
+        self.assertTrue(registry['abc'] is new)
+        self.assertEqual(registry.by_country('NOWHERE'), (new,))
+        self.assertRaises(KeyError, registry.by_numeric, 1)
+
+        del registry['ABC']
+        self.assertFalse('abc' in registry)
+        self.assertRaises(KeyError, registry.by_numeric, 2)
+
+
+    def testLazyLoading(self):
+        registry = CurrencyRegistry(source=CURRENCY_DATA)
+        self.assertEqual(len(registry._currencies), 0)
+
+        # Only the requested currency is built
+        self.assertEqual(registry['gbp'].name, 'Pound Sterling')
+        self.assertEqual(len(registry._currencies), 1)
+
+        # Explicit registrations take precedence over the data file
+        custom = registry.register(Currency(code='EUR', numeric='978', name='Custom Euro'))
+        self.assertEqual(len(registry), len(CURRENCY))
+        self.assertTrue(registry['EUR'] is custom)
+        self.assertEqual(registry['JPY'].decimals, 0)
+        self.assertEqual(registry['EUR'].symbol, u"")
+        self.assertEqual(registry['RUB'].symbol, u"\u0440\u0443\u0431")
+
+    def testCopy(self):
+        # Copies of a freshly loaded registry have every currency
+        registry = CurrencyRegistry(source=CURRENCY_DATA)
+        registry['gbp']
+        self.assertEqual(len(dict(registry)), len(CURRENCY))
+        copy = {}
+        copy.update(CurrencyRegistry(source=CURRENCY_DATA))
+        self.assertEqual(len(copy), len(CURRENCY))
+        self.assertEqual(sorted(registry.copy()), sorted(CURRENCY))
+
+
+class MoneyArrayTestCase(TestCase):
+
+    def setUp(self):
+        self.moneys = [Money('1.25', 'USD'), Money(3, 'USD'), Money('-0.50', 'USD')]
+        self.array = MoneyArray.from_money(self.moneys)
+
+    def testRoundTrip(self):
+        self.assertEqual(list(self.array.units), [125, 300, -50])
+        self.assertEqual(self.array.to_money(), self.moneys)
+
+        yen = MoneyArray.from_amounts([100, 250], 'JPY')
+        self.assertEqual(list(yen.units), [100, 250])
+        self.assertEqual(yen[1], Money(250, 'JPY'))
+
+        self.assertRaises(ValueError, MoneyArray.from_amounts, ['1.001'], 'USD')
+        self.assertRaises(TypeError, MoneyArray.from_money, [Money(1, 'USD'), Money(1, 'EUR')])
+
+    def testArithmetic(self):
+        self.assertEqual((self.array + self.array).to_money(),
+                         [Money('2.50', 'USD'), Money(6, 'USD'), Money(-1, 'USD')])
+        self.assertEqual((self.array - Money(1, 'USD')).to_money(),
+                         [Money('0.25', 'USD'), Money(2, 'USD'), Money('-1.50', 'USD')])
+        # Products are rounded half to even to the minor unit
+        self.assertEqual(list((self.array * Decimal('1.5')).units), [188, 450, -75])
+        self.assertEqual(list((10 % self.array).units), [12, 30, -5])
+        self.assertRaises(TypeError, lambda: self.array * self.array)
+
+    def testComparison(self):
+        self.assertEqual(self.array < 2, [True, False, True])
+        self.assertEqual(self.array >= Money(3, 'USD'), [False, True, False])
+        self.assertTrue(self.array == self.array[:])
+        self.assertRaises(TypeError, lambda: self.array < Money(1, 'EUR'))
+
+    def testReductions(self):
+        self.assertEqual(self.array.sum(), Money('3.75', 'USD'))
+        self.assertEqual(self.array.min(), Money('-0.50', 'USD'))
+        self.assertEqual(self.array.max(), Money(3, 'USD'))
+
+    def testAllocate(self):
+        first, second = self.array.allocate((1, 2))
+        self.assertEqual(list(first.units), [42, 100, -17])
+        self.assertEqual(list(second.units), [83, 200, -33])
+
+    def testConvert(self):
+        yen = MoneyArray.from_amounts([100, 255], 'JPY')
+        dollars = yen.convert(Decimal('0.01'), 'USD')
+        self.assertEqual(dollars.to_money(), [Money(1, 'USD'), Money('2.55', 'USD')])
+
+
+class MoneyBagTestCase(TestCase):
+
+    def testAccumulate(self):
+        bag = MoneyBag()
+        bag += Money(10, 'USD')
+        bag += Money(5, 'EUR')
+        bag += Money('2.50', 'USD')
+        self.assertEqual(bag['USD'], Money('12.50', 'USD'))
+        self.assertEqual(bag['eur'], Money(5, 'EUR'))
+        self.assertEqual(bag['JPY'], Money(0, 'JPY'))
+        self.assertEqual(list(bag), [Money(5, 'EUR'), Money('12.50', 'USD')])
+
+        other = MoneyBag(Money(1, 'EUR'), Money(1, 'GBP'))
+        bag += other
+        self.assertEqual(len(bag), 3)
+        self.assertEqual(bag['EUR'], Money(6, 'EUR'))
+        self.assertEqual(sum([other, other]), MoneyBag(Money(2, 'EUR'), Money(2, 'GBP')))
+
+        bag -= other
+        self.assertEqual(bag, MoneyBag(Money(5, 'EUR'), Money('12.50', 'USD')))
+        self.assertTrue(MoneyBag() == 0)
+        self.assertRaises(TypeError, bag.add, 10)
+
+        # Money leaves the addition to the bag
+        self.assertEqual(Money(1, 'GBP') + bag, MoneyBag(Money(5, 'EUR'), Money(1, 'GBP'), Money('12.50', 'USD')))
+        self.assertTrue(Money(5, 'EUR') == MoneyBag(Money(5, 'EUR')))
+        self.assertRaises(TypeError, lambda: Money(1, 'USD') * bag)
+
+    def testConvertTo(self):
+        rates = RateTable([('EUR', 'USD', 2), ('GBP', 'USD', 3)])
+        bag = MoneyBag(Money(1, 'USD'), Money(2, 'EUR'), Money(3, 'GBP'), Money(4, 'EUR'))
+        self.assertEqual(bag.convert_to('USD', rates), Money(22, 'USD'))
+        self.assertEqual(bag.convert_to('EUR', rates), Money(11, 'EUR'))
+
+        # A source installed while the bag is converted is not used for it
+        class Swapping(RateTable):
+            def rate(self, source, target):
+                set_rate_source(RateTable([('EUR', 'USD', 1), ('GBP', 'USD', 1)]))
+                return RateTable.rate(self, source, target)
+        set_rate_source(Swapping([('EUR', 'USD', 2), ('GBP', 'USD', 3)]))
+        try:
+            self.assertEqual(bag.convert_to('USD'), Money(22, 'USD'))
+        finally:
+            set_rate_source(None)
+
+        # Nor is one installed while a bag is converted without one
+        class Installing(Decimal):
+            def __div__(self, other):
+                set_rate_source(RateTable([('EUR', 'USD', 1), ('GBP', 'USD', 1)]))
+                return Decimal.__div__(self, other)
+        EUR, GBP = CURRENCY['EUR'], CURRENCY['GBP']
+        EUR.exchange_rate, GBP.exchange_rate = Installing(2), Installing(3)
+        try:
+            self.assertEqual(MoneyBag(Money(2, 'EUR'), Money(3, 'GBP')).convert_to('USD'), Money(13, 'USD'))
+        finally:
+            set_rate_source(None)
+            EUR.exchange_rate = GBP.exchange_rate = Decimal('1.0')
+
+
+class RateTableTestCase(TestCase):
+
+    def setUp(self):
+        self.rates = RateTable([
+            ('USD', 'EUR', '0.80'),
+            ('USD', 'JPY', 100),
+            ('GBP', 'EUR', '1.25'),
+            ('CHF', 'GBP', '0.50'),
+        ], base='USD')
+
+    def tearDown(self):
+        set_rate_source(None)
+
+    def testRates(self):
+        # Direct, inverse and identity rates
+        self.assertEqual(self.rates.rate('USD', 'EUR'), Decimal('0.80'))
+        self.assertEqual(self.rates.rate('EUR', 'USD'), Decimal('1.25'))
+        self.assertEqual(self.rates.rate('EUR', 'EUR'), 1)
+
+        # Cross rates through the base currency
+        self.assertEqual(self.rates.rate(CURRENCY['EUR'], CURRENCY['JPY']), 125)
+        # and along longer chains
+        self.assertEqual(self.rates.rate('CHF', 'JPY'), Decimal('78.125'))
+
+        self.assertRaises(ExchangeRateNotFound, self.rates.rate, 'USD', 'AUD')
+        self.assertRaises(ValueError, self.rates.set_rate, 'USD', 'AUD', 0)
+
+    def testUpdate(self):
+        self.rates.set_rate('EUR', 'JPY', 120)
+        self.assertEqual(self.rates.rate('EUR', 'JPY'), 120)
+        self.assertEqual(self.rates.rate('GBP', 'JPY'), 150)
+        self.rates.remove_rate('EUR', 'JPY')
+        self.assertEqual(self.rates.rate('EUR', 'JPY'), 125)
+
+    def testConvertTo(self):
+        self.assertEqual(Money(10, 'EUR').convert_to('JPY', self.rates), Money(1250, 'JPY'))
+        self.assertEqual(self.rates.convert(Money(10, 'EUR'), 'USD'), Money('12.5', 'USD'))
+
+        set_rate_source(self.rates)
+        self.assertEqual(Money(2, 'GBP').convert_to(CURRENCY['EUR']), Money('2.5', 'EUR'))
+        self.assertEqual(MoneyArray.from_money([Money(2, 'GBP')]).convert_to('JPY').sum(), Money(312, 'JPY'))
+
+    def testConvertMany(self):
+        moneys = [Money(10, 'EUR'), Money(1, 'USD'), Money(2, 'GBP'), Money(20, 'EUR')]
+        converted = [Money('12.5', 'USD'), Money(1, 'USD'), Money('3.125', 'USD'), Money(25, 'USD')]
+        self.assertEqual(convert_many(moneys, 'USD', self.rates), converted)
+
+        set_rate_source(self.rates)
+        results = iconvert_many(iter(moneys), 'USD')
+        self.assertEqual(results.next(), converted[0])
+        # The rest of the batch keeps using the rates it started with
+        set_rate_source(RateTable([('EUR', 'USD', 1), ('GBP', 'USD', 1)]))
+        self.assertEqual(list(results), converted[1:])
+        set_rate_source(self.rates)
+        self.assertRaises(ExchangeRateNotFound, convert_many, [Money(1, 'AUD')], 'USD')
+
+        # So does a batch started without an installed source
+        set_rate_source(None)
+        fallback = [money.convert_to('USD') for money in moneys]
+        results = iconvert_many(iter(moneys), 'USD')
+        self.assertEqual(results.next(), fallback[0])
+        set_rate_source(self.rates)
+        self.assertEqual(list(results), fallback[1:])
+
+
+class RateRefresherTestCase(TestCase):
+
+    def tearDown(self):
+        set_rate_source(None)
+
+    def testRefresh(self):
+        def broken():
+            raise IOError('provider is down')
+        rates = [('EUR', 'USD', '1.25')]
+        refresher = RateRefresher([broken, lambda: rates])
+        snapshot = refresher.refresh()
+        self.assertTrue(isinstance(snapshot, RateSnapshot))
+        self.assertTrue(refresher.snapshot is snapshot)
+        self.assertTrue(isinstance(refresher.last_error, IOError))
+        self.assertEqual(Money(2, 'EUR').convert_to('USD'), Money('2.5', 'USD'))
+        self.assertRaises(TypeError, snapshot.set_rate, 'EUR', 'USD', 2)
+
+        # A new snapshot replaces the old one, which keeps its rates
+        rates = [('EUR', 'USD', 2)]
+        refresher.refresh()
+        self.assertEqual(Money(2, 'EUR').convert_to('USD'), Money(4, 'USD'))
+        self.assertEqual(snapshot.rate(CURRENCY['EUR'], CURRENCY['USD']), Decimal('1.25'))
+
+        # When every provider fails the last snapshot stays in place
+        refresher.providers = [broken]
+        self.assertEqual(refresher.refresh(), None)
+        self.assertEqual(Money(2, 'EUR').convert_to('USD'), Money(4, 'USD'))
+        self.assertTrue(isinstance(refresher.last_error, IOError))
+
+        # and the error is cleared by the next refresh that succeeds
+        refresher.providers = [lambda: rates]
+        refresher.refresh()
+        self.assertEqual(refresher.last_error, None)
+
+    def testTimeout(self):
+        release = threading.Event()
+        def hanging():
+            release.wait(5)
+            return [('EUR', 'USD', 9)]
+        refresher = RateRefresher([hanging, lambda: {('EUR', 'USD'): 1}], timeout=0.05, install=False)
+        refresher.refresh()
+        release.set()
+        self.assertEqual(refresher.snapshot.rate(CURRENCY['EUR'], CURRENCY['USD']), 1)
+        self.assertTrue(isinstance(refresher.last_error, RuntimeError))
+
+    def testFailingCallback(self):
+        calls = []
+        def publish(snapshot):
+            calls.append(snapshot)
+            raise ValueError('too many rates')
+        refresher = RateRefresher(lambda: [('EUR', 'USD', 2)], interval=0.01, install=False, on_refresh=publish)
+        refresher.start()
+        try:
+            for i in range(500):
+                if len(calls) >= 3:
+                    break
+                time.sleep(0.01)
+            # The thread keeps refreshing after the callback fails
+            self.assertTrue(len(calls) >= 3)
+            self.assertTrue(refresher._thread.is_alive())
+            self.assertTrue(isinstance(refresher.last_error, ValueError))
+        finally:
+            refresher.stop()
+
+    def testFileProvider(self):
+        handle, path = tempfile.mkstemp()
+        os.write(handle, '# rates\nEUR USD 1.25\n\nGBP USD 1.5\n')
+        os.close(handle)
+        try:
+            self.assertEqual(FileRateProvider(path)(), [('EUR', 'USD', '1.25'), ('GBP', 'USD', '1.5')])
+        finally:
+            os.remove(path)
+
+
+class SharedRatesTestCase(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        self.writer = SharedRates.create(self.path, 'USD', capacity=8)
+        self.reader = SharedRates(self.path)
+
+    def tearDown(self):
+        set_rate_source(None)
+        self.reader.close()
+        self.writer.close()
+        os.remove(self.path)
+
+    def testPublish(self):
+        EUR, GBP, USD = CURRENCY['EUR'], CURRENCY['GBP'], CURRENCY['USD']
+        self.assertRaises(ExchangeRateNotFound, self.reader.rate, EUR, USD)
+        self.writer.publish(RateTable([('EUR', 'USD', '1.25'), ('GBP', 'USD', '1.5'), ('USD', 'JPY', 100)]))
+        self.assertEqual(self.reader.rate(EUR, USD), Decimal('1.25'))
+        self.assertEqual(self.reader.rate('JPY', 'USD'), Decimal('0.01'))
+        self.assertEqual(self.reader.rate(GBP, EUR), Decimal('1.2'))
+        self.assertEqual(len(self.reader.currencies()), 4)
+
+        set_rate_source(self.reader)
+        self.assertEqual(Money(10, 'EUR').convert_to('USD'), Money('12.5', 'USD'))
+        # A new publication is seen by readers on their next lookup
+        self.writer.publish({'EUR': 2, 'GBP': 3})
+        self.assertEqual(Money(10, 'EUR').convert_to('USD'), Money(20, 'USD'))
+        self.assertRaises(ExchangeRateNotFound, self.reader.rate, CURRENCY['JPY'], USD)
+
+    def testOddSequence(self):
+        # A writer that stopped half way left the sequence number odd; the
+        # next publication still ends on an even number
+        self.writer.publish({'EUR': 2})
+        with open(self.path, 'r+b') as f:
+            f.seek(8)
+            f.write(struct.pack('<Q', 3))
+        self.writer.publish({'EUR': 3})
+        self.assertEqual(self.reader.rate(CURRENCY['EUR'], CURRENCY['USD']), 3)
+
+    def testCreateExisting(self):
+        # An existing table is kept as it is, for the readers that map it
+        self.writer.publish({'EUR': 2})
+        sequence = self.reader._current()[0]
+        writer = SharedRates.create(self.path, 'USD', capacity=8)
+        try:
+            self.assertEqual(writer._current()[0], sequence)
+            self.assertEqual(self.reader.rate(CURRENCY['EUR'], CURRENCY['USD']), 2)
+            writer.publish({'EUR': 3})
+            self.assertEqual(self.reader.rate(CURRENCY['EUR'], CURRENCY['USD']), 3)
+        finally:
+            writer.close()
+        self.assertRaises(ValueError, SharedRates.create, self.path, 'EUR', capacity=8)
+        self.assertRaises(ValueError, SharedRates.create, self.path, 'USD', capacity=16)
+
+    def testCapacity(self):
+        rates = dict((code, 1) for code in ('EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD', 'SEK', 'NOK'))
+        self.assertRaises(ValueError, self.writer.publish, rates)
+
+    def testRefresher(self):
+        refresher = RateRefresher(lambda: [('EUR', 'USD', 2)], install=False, on_refresh=self.writer.publish)
+        refresher.refresh()
+        self.assertEqual(self.reader.rate(CURRENCY['EUR'], CURRENCY['USD']), 2)
+
+
+class HistoricalRatesTestCase(TestCase):
+
+    def setUp(self):
+        self.rates = HistoricalRates([
+            ('EUR', 'USD', '1.20', date(2020, 6, 1)),
+            ('EUR', 'USD', '1.10', date(2020, 1, 1)),
+            ('GBP', 'USD', '1.25', date(2020, 1, 1)),
+        ], base='USD')
+
+    def tearDown(self):
+        set_rate_source(None)
+
+    def testRate(self):
+        self.assertEqual(self.rates.rate('EUR', 'USD', date(2020, 1, 1)), Decimal('1.10'))
+        self.assertEqual(self.rates.rate('EUR', 'USD', date(2020, 5, 31)), Decimal('1.10'))
+        self.assertEqual(self.rates.rate('EUR', 'USD', date(2020, 6, 1)), Decimal('1.20'))
+        self.assertEqual(self.rates.rate('EUR', 'USD'), Decimal('1.20'))
+        self.assertEqual(self.rates.rate('USD', 'GBP', date(2020, 2, 1)), Decimal('0.8'))
+        self.assertEqual(self.rates.rate('EUR', 'GBP', date(2020, 2, 1)), Decimal('0.88'))
+        self.assertRaises(ExchangeRateNotFound, self.rates.rate, 'EUR', 'USD', date(2019, 12, 31))
+        self.assertRaises(ExchangeRateNotFound, self.rates.rate, 'EUR', 'JPY')
+
+        # Restating a rate replaces it
+        self.rates.set_rate('EUR', 'USD', '1.15', date(2020, 1, 1))
+        self.assertEqual(self.rates.rate('EUR', 'USD', date(2020, 2, 1)), Decimal('1.15'))
+
+    def testConvertTo(self):
+        set_rate_source(self.rates)
+        self.assertEqual(Money(10, 'EUR').convert_to('USD', at=date(2020, 3, 1)), Money(11, 'USD'))
+        self.assertEqual(Money(10, 'EUR').convert_to('USD'), Money(12, 'USD'))
+
+    def testConvertSorted(self):
+        items = [
+            (date(2020, 2, 1), Money(10, 'EUR')),
+            (date(2020, 2, 1), Money(10, 'USD')),
+            (date(2020, 7, 1), Money(10, 'GBP')),
+            (date(2020, 7, 1), Money(10, 'EUR')),
+            # out of order
+            (date(2020, 3, 1), Money(10, 'EUR')),
+        ]
+        self.assertEqual(list(self.rates.convert_sorted(items, 'USD')),
+                         [Money(11, 'USD'), Money(10, 'USD'), Money('12.5', 'USD'), Money(12, 'USD'), Money(11, 'USD')])
+
+        # None means the latest rate, wherever it appears
+        items = [(None, Money(10, 'EUR')), (date(2020, 2, 1), Money(10, 'EUR')), (None, Money(10, 'EUR'))]
+        self.assertEqual(list(self.rates.convert_sorted(items, 'USD')),
+                         [Money(12, 'USD'), Money(11, 'USD'), Money(12, 'USD')])
+
 
 class MoneyFieldTestCase(TestCase):
 
@@ -95,7 +905,7 @@ class MoneyFieldTestCase(TestCase):
 
         ent = TestMoneyModel.objects.filter(price__exact=Money(100, "USD")).get()
         self.assertEquals(ent.price, Money(100, "USD"))
-        ent.price.amount = 300
+        ent.price = Money(300, "USD")
         ent.save()
 
         ent = TestMoneyModel.objects.filter(price__exact=Money(300, "USD")).get()
@@ -200,9 +1010,9 @@ class MoneyFieldTestCase(TestCase):
     def testProxy(self):
         e = TestMoneyModel()
         e.price = Money(0, "BGN")
-        e.price.amount = 3
-        self.assertEqual(e.price, Money(3, "BGN"))
-        e.price.from_string("BGN 5.0")
+        self.assertRaises(AttributeError, setattr, e.price, 'amount', 3)
+        self.assertEqual(e.price, Money(0, "BGN"))
+        e.price = Money.from_string("BGN 5.0")
         self.assertEqual(e.price, Money(5, "BGN"))
 
         e1 = TestMoneyModel(price=Money(100, "USD"))
@@ -214,10 +1024,109 @@ class MoneyFieldTestCase(TestCase):
         self.assertEqual(e1.price, Money(100, "USD"))
         self.assertEqual(e2.price, Money(300, "USD"))
 
-        e2.price.from_string("USD 400")
+        e2.price = e2.price.from_string("USD 400")
         self.assertEqual(e1.price, Money(100, "USD"))
         self.assertEqual(e2.price, Money(400, "USD"))
 
+    def testProxyCache(self):
+        e = TestMoneyModel(price=Money(100, "USD"))
+        # Repeated reads return the same instance, and the raw amount stays
+        self.assertTrue(e.price is e.price)
+        self.assertEqual(e.__dict__['price'], Decimal(100))
+
+        price = e.price
+        e.price = Money(5, "EUR")
+        self.assertFalse(e.price is price)
+        self.assertEqual(e.price, Money(5, "EUR"))
+
+        # Changing either column directly is noticed as well
+        e.price_currency = u"GBP"
+        self.assertEqual(e.price, Money(5, "GBP"))
+        e.price = 7
+        self.assertEqual(e.price, Money(7, "GBP"))
+        self.assertFalse(isinstance(e.__dict__['price'], Money))
+
+        e.save()
+        e = TestMoneyModel.objects.get(pk=e.pk)
+        self.assertEqual(e.price, Money(7, "GBP"))
+
+
+    def testBulkCreate(self):
+        objs = [TestMoneyModel(name='a', price=Money(1, 'EUR')), TestMoneyModel(name='b', price=2)]
+        with self.assertNumQueries(1):
+            TestMoneyModel.objects.bulk_create(objs, default_currency='GBP')
+        self.assertEqual(TestMoneyModel.objects.get(name='a').price, Money(1, 'EUR'))
+        self.assertEqual(TestMoneyModel.objects.get(name='b').price, Money(2, 'GBP'))
+
+        # The field's own default currency comes next
+        TestMoneyModel_USD.objects.bulk_create([TestMoneyModel_USD(name='c', price=3)])
+        self.assertEqual(TestMoneyModel_USD.objects.get(name='c').price, Money(3, 'USD'))
+
+    def testBulkUpdate(self):
+        TestMoneyModel.objects.bulk_create([TestMoneyModel(name=str(i), price=Money(i, 'USD')) for i in range(5)])
+        objs = list(TestMoneyModel.objects.order_by('name'))
+        for obj in objs:
+            obj.price = obj.price * 2 if obj.name != '3' else Money(7, 'EUR')
+            obj.name = 'x' + obj.name
+        with self.assertNumQueries(3):
+            updated = TestMoneyModel.objects.bulk_update(objs, ['price'], batch_size=2)
+        self.assertEqual(updated, 5)
+        saved = dict((obj.name, obj.price) for obj in TestMoneyModel.objects.all())
+        self.assertEqual(saved, {'0': Money(0, 'USD'), '1': Money(2, 'USD'), '2': Money(4, 'USD'),
+                                 '3': Money(7, 'EUR'), '4': Money(8, 'USD')})
+        self.assertEqual(TestMoneyModel.objects.bulk_update(objs, ['name', 'price']), 5)
+        self.assertEqual(TestMoneyModel.objects.filter(name__startswith='x').count(), 5)
+
+    def testUpdate(self):
+        for amount, code in ((10, 'USD'), (20, 'USD'), (5, 'EUR')):
+            TestMoneyModel.objects.create(name='%s %s' % (amount, code), price=Money(amount, code))
+        prices = lambda: dict((obj.name, obj.price) for obj in TestMoneyModel.objects.all())
+
+        self.assertEqual(TestMoneyModel.objects.update(price=F('price') * 2), 3)
+        self.assertEqual(prices(), {'10 USD': Money(20, 'USD'), '20 USD': Money(40, 'USD'), '5 EUR': Money(10, 'EUR')})
+
+        # Only the rows in the currency of the Money are updated
+        self.assertEqual(TestMoneyModel.objects.update(price=F('price') + Money('0.5', 'USD')), 2)
+        self.assertEqual(TestMoneyModel.objects.update(price=F('price') - Money(1, 'EUR') * 3), 1)
+        self.assertEqual(prices(), {'10 USD': Money('20.5', 'USD'), '20 USD': Money('40.5', 'USD'), '5 EUR': Money(7, 'EUR')})
+
+        self.assertEqual(TestMoneyModel.objects.filter(name='5 EUR').update(price=Money(3, 'GBP')), 1)
+        self.assertEqual(TestMoneyModel.objects.get(name='5 EUR').price, Money(3, 'GBP'))
+
+        self.assertRaises(TypeError, TestMoneyModel.objects.update, price=F('price') + Money(1, 'USD') - Money(1, 'EUR'))
+        self.assertRaises(TypeError, TestMoneyModel.objects.update, price=F('price') * Money(2, 'USD'))
+        self.assertRaises(TypeError, TestMoneyModel.objects.update, price=Money(1, 'USD'), price_currency='EUR')
+        self.assertEqual(TestMoneyModel.objects.filter(price_currency='USD').count(), 2)
+
+    def testMoneyAggregate(self):
+        for amount, code in ((10, 'USD'), (20, 'USD'), (5, 'EUR'), (1, 'JPY')):
+            TestMoneyModel.objects.create(name='%s %s' % (amount, code), price=Money(amount, code))
+        USD, EUR, JPY = CURRENCY['USD'], CURRENCY['EUR'], CURRENCY['JPY']
+
+        totals = TestMoneyModel.objects.money_aggregate('price')
+        self.assertEqual(totals, {USD: Money(30, 'USD'), EUR: Money(5, 'EUR'), JPY: Money(1, 'JPY')})
+        self.assertEqual(TestMoneyModel.objects.money_aggregate('price', Max)[USD], Money(20, 'USD'))
+        self.assertEqual(TestMoneyModel.objects.money_aggregate('price', Avg)[USD], Money(15, 'USD'))
+        self.assertEqual(TestMoneyModel.objects.filter(price_currency='EUR').money_aggregate('price').keys(), [EUR])
+        self.assertRaises(ValueError, TestMoneyModel.objects.money_aggregate, 'price', Count)
+
+        rates = RateTable([('EUR', 'USD', 2), ('USD', 'JPY', 100)])
+        objects = TestMoneyModel.objects
+        self.assertEqual(objects.money_aggregate('price', Sum, 'USD', rates), Money('40.01', 'USD'))
+        self.assertEqual(objects.money_aggregate('price', Min, 'USD', rates), Money('0.01', 'USD'))
+        self.assertEqual(objects.money_aggregate('price', Avg, 'USD', rates), Money('10.0025', 'USD'))
+        self.assertEqual(objects.filter(name='none').money_aggregate('price', Sum, 'USD', rates), None)
+
+        # Rows without a currency are in the default currency, and are
+        # combined with the rows that have it
+        TestMoneyModel.objects.create(name='no currency', price=Money(40, 'USD'))
+        TestMoneyModel.objects.filter(name='no currency').update(price_currency='')
+        with default_currency('USD'):
+            self.assertEqual(objects.money_aggregate('price')[USD], Money(70, 'USD'))
+            self.assertEqual(objects.money_aggregate('price', Max)[USD], Money(40, 'USD'))
+            self.assertEqual(objects.money_aggregate('price', Min)[USD], Money(10, 'USD'))
+            self.assertEqual(objects.money_aggregate('price', Avg)[USD], Money(Decimal(70) / 3, 'USD'))
+            self.assertEqual(objects.money_aggregate('price', Avg, 'USD', rates), Money('16.002', 'USD'))
 
     def testEdgeCases(self):
         created = TestMoneyModel.objects.create(name="zero dollars", price=Money(0, "USD"))
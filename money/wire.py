@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import struct
+from array import array
+from Money import Currency, CURRENCY, get_default_currency, _make, _units, _from_units
+from MoneyArray import MoneyArray, TYPECODE
+
+__all__ = ('RECORD', 'pack', 'pack_many', 'unpack', 'unpack_many', 'unpack_array')
+
+# One record per amount, little endian and without padding: the ISO 4217
+# numeric code of the currency, the number of decimal places and the amount
+# as a signed 64 bit integer of units of that decimal place.
+RECORD = struct.Struct('<Hbq')
+
+
+def _numeric(currency):
+    """
+    Returns the numeric code of a currency, as long as decoding it gives the
+    same currency back.
+    """
+    try:
+        numeric = int(currency.numeric)
+        found = CURRENCY.by_numeric(numeric)
+    except (KeyError, ValueError, TypeError):
+        found = None
+    if found is not currency:
+        raise ValueError('%s has no numeric code that identifies it in the registry' % currency.code)
+    return numeric
+
+def _encode(money, numerics):
+    currency = money.currency
+    numeric = numerics.get(currency)
+    if numeric is None:
+        numeric = numerics[currency] = _numeric(currency)
+    units, exponent = _units(money.amount, currency.decimals)
+    return numeric, -exponent, units
+
+def pack(money):
+    """
+    Encodes one Money as a RECORD.size byte string.
+    """
+    return pack_many([money])
+
+def pack_many(moneys):
+    """
+    Encodes a sequence of Money as consecutive records in a single byte
+    string. Amounts keep all of their decimal places, and ValueError is
+    raised if one does not fit in 64 bits.
+    """
+    moneys = list(moneys)
+    size = RECORD.size
+    data = bytearray(size * len(moneys))
+    pack_into = RECORD.pack_into
+    numerics = {}
+    offset = 0
+    try:
+        for money in moneys:
+            pack_into(data, offset, *_encode(money, numerics))
+            offset += size
+    except struct.error:
+        raise ValueError('%r does not fit in a wire record' % money)
+    return str(data)
+
+def _count(data):
+    count, extra = divmod(len(data), RECORD.size)
+    if extra:
+        raise ValueError('buffer is not a whole number of records')
+    return count
+
+def unpack(data, index=0):
+    """
+    Decodes the record at the given index of a buffer.
+    """
+    numeric, scale, units = RECORD.unpack_from(data, index * RECORD.size)
+    return _make(_from_units(units, -scale), CURRENCY.by_numeric(numeric))
+
+def unpack_many(data):
+    """
+    Decodes the records of a buffer (a byte string, bytearray, buffer or
+    memoryview) one at a time, yielding Money lazily. Each record is read
+    straight out of the buffer, so no copy of the data is made.
+    """
+    unpack_from = RECORD.unpack_from
+    size = RECORD.size
+    currencies = {}
+    for offset in xrange(0, _count(data) * size, size):
+        numeric, scale, units = unpack_from(data, offset)
+        currency = currencies.get(numeric)
+        if currency is None:
+            currency = currencies[numeric] = CURRENCY.by_numeric(numeric)
+        yield _make(_from_units(units, -scale), currency)
+
+def unpack_array(data, currency=None):
+    """
+    Decodes a buffer of records in a single currency directly into a
+    MoneyArray, without building a Money per record. Raises TypeError if the
+    records are in different currencies and ValueError if an amount has more
+    decimal places than the currency.
+    """
+    if currency is not None and not isinstance(currency, Currency):
+        currency = CURRENCY[currency]
+    unpack_from = RECORD.unpack_from
+    size = RECORD.size
+    units = array(TYPECODE)
+    append = units.append
+    expected = currency and int(currency.numeric)
+    for offset in xrange(0, _count(data) * size, size):
+        numeric, scale, amount = unpack_from(data, offset)
+        if numeric != expected:
+            if currency is not None:
+                raise TypeError('currency mismatch')
+            currency = CURRENCY.by_numeric(numeric)
+            expected = numeric
+        shift = currency.decimals - scale
+        if shift > 0:
+            amount *= 10 ** shift
+        elif shift < 0:
+            amount, remainder = divmod(amount, 10 ** -shift)
+            if remainder:
+                raise ValueError("amount has more than %d decimal places" % currency.decimals)
+        append(amount)
+    return MoneyArray._wrap(units, currency or get_default_currency())